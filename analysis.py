@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import smartMoveFinder
+from chessEngine import BitboardGameState, coordinates
+from evaluation import encode_fen, evaluate_batch
+
+STATIC_BATCH_SIZE = 4096
+
+
+def readPositions(path):
+    # yields (id, fen, bestMoves) one line at a time; accepts plain FEN lines and EPD lines with "bm" and "id"
+    with open(path, "r") as positionFile:
+        for number, line in enumerate(positionFile, 1):
+            line = line.strip()
+            if line == "" or line.startswith("#"):
+                continue
+            fields = line.split(None, 4)
+            if len(fields) < 4:
+                continue
+            fen = " ".join(fields[:4])
+            rest = fields[4] if len(fields) > 4 else ""
+            counters = rest.split()
+            if len(counters) == 2 and counters[0].isdigit() and counters[1].isdigit():
+                yield str(number), fen + " " + rest, []
+                continue
+            name = str(number)
+            bestMoves = []
+            counters = {"hmvc": "0", "fmvn": "1"}
+            for operation in rest.split(";"):
+                tokens = operation.split()
+                if not tokens:
+                    continue
+                if tokens[0] == "id":
+                    name = " ".join(tokens[1:]).strip('"')
+                elif tokens[0] == "bm":
+                    bestMoves = tokens[1:]
+                elif tokens[0] in counters and len(tokens) > 1:
+                    counters[tokens[0]] = tokens[1]
+            yield name, "%s %s %s" % (fen, counters["hmvc"], counters["fmvn"]), bestMoves
+
+
+def initWorker():
+    smartMoveFinder.inBook = False
+
+
+def analysePosition(name, fen, bestMoves, maxDepth, timeLimit, nodeLimit):
+    gs = BitboardGameState()
+    gs.set_fen(fen)
+    smartMoveFinder.transpositionTable.clear()
+    smartMoveFinder.historyScores.clear()
+    validMoves = gs.get_valid_moves()
+    start = time.perf_counter()
+    move = smartMoveFinder.findBestMove(gs, validMoves, maxDepth=maxDepth, timeLimit=timeLimit,
+                                        nodeLimit=nodeLimit, workers=1) if validMoves else None
+    elapsed = time.perf_counter() - start
+    result = {"id": name, "fen": fen, "move": coordinates(move), "san": gs.get_san(move, validMoves) if move else None,
+              "score": round(smartMoveFinder.searchScore, 4) if move else None,
+              "depth": smartMoveFinder.completedDepth if move else 0,
+              "nodes": smartMoveFinder.nodesSearched if move else 0, "time": round(elapsed, 4)}
+    if bestMoves:
+        # EPD best moves may carry check marks that the engine's SAN and the author's may disagree on
+        result["solved"] = result["san"] is not None and \
+            result["san"].rstrip("+#") in [bestMove.rstrip("+#") for bestMove in bestMoves]
+    return result
+
+
+def analysePositions(positions, maxDepth=None, timeLimit=None, nodeLimit=None, workers=None):
+    # yields results in completion order; at most two positions per worker are read ahead of the results
+    workers = workers or os.cpu_count() or 1
+    positions = iter(positions)
+    with ProcessPoolExecutor(max_workers=workers, initializer=initWorker) as pool:
+        pending = set()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < workers * 2:
+                position = next(positions, None)
+                if position is None:
+                    exhausted = True
+                    break
+                pending.add(pool.submit(analysePosition, *position, maxDepth, timeLimit, nodeLimit))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def evaluatePositions(positions, batchSize=STATIC_BATCH_SIZE):
+    # static material and piece-square scores without a search, scored a batch at a time through numpy
+    batch = []
+    for position in positions:
+        batch.append(position)
+        if len(batch) == batchSize:
+            yield from staticResults(batch)
+            batch = []
+    if batch:
+        yield from staticResults(batch)
+
+
+def staticResults(batch):
+    scores = evaluate_batch([encode_fen(fen) for name, fen, bestMoves in batch])
+    for (name, fen, bestMoves), score in zip(batch, scores):
+        yield {"id": name, "fen": fen, "score": round(score, 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse every position in a FEN or EPD file.")
+    parser.add_argument("path", help="file with one FEN or EPD position per line")
+    parser.add_argument("--depth", type=int, default=None)
+    parser.add_argument("--time", type=float, default=None, help="seconds per position")
+    parser.add_argument("--nodes", type=int, default=None, help="nodes per position")
+    parser.add_argument("--workers", type=int, default=None, help="processes to analyse in (default: all cores)")
+    parser.add_argument("--json", action="store_true", help="write one JSON object per line")
+    parser.add_argument("--static", action="store_true", help="only score material and piece placement, no search")
+    args = parser.parse_args()
+
+    if args.static:
+        for result in evaluatePositions(readPositions(args.path)):
+            if args.json:
+                sys.stdout.write(json.dumps(result) + "\n")
+            else:
+                sys.stdout.write("%-20s %8.2f\n" % (result["id"], result["score"]))
+        return
+
+    maxDepth = args.depth
+    if maxDepth is None and args.time is None and args.nodes is None:
+        maxDepth = smartMoveFinder.DEPTH
+    solved = tried = 0
+    totalNodes = 0
+    start = time.perf_counter()
+    for result in analysePositions(readPositions(args.path), maxDepth, args.time, args.nodes, args.workers):
+        totalNodes += result["nodes"]
+        if "solved" in result:
+            tried += 1
+            solved += result["solved"]
+        if args.json:
+            sys.stdout.write(json.dumps(result) + "\n")
+        else:
+            sys.stdout.write("%-20s %-7s %8s  depth %2d  %9d nodes  %6.2fs%s\n" % (
+                result["id"], result["san"], "%.2f" % result["score"] if result["score"] is not None else "-",
+                result["depth"], result["nodes"], result["time"],
+                "" if "solved" not in result else "  ok" if result["solved"] else "  missed"))
+        sys.stdout.flush()
+    elapsed = time.perf_counter() - start
+    if not args.json:
+        sys.stdout.write("%d nodes in %.2fs%s\n" % (totalNodes, elapsed,
+                                                    ", solved %d/%d" % (solved, tried) if tried else ""))
+
+
+if __name__ == "__main__":
+    main()
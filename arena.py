@@ -0,0 +1,205 @@
+import argparse
+import math
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import smartMoveFinder
+from chessEngine import BitboardGameState, MATERIAL_WEIGHT
+
+MAX_PLIES = 300
+RESIGN_SCORE = 10 * MATERIAL_WEIGHT
+RESIGN_PLIES = 6
+DRAW_SCORE = 0.2
+DRAW_PLIES = 20
+DRAW_START_PLY = 80
+
+
+def loadOpenings(path=smartMoveFinder.OPENING_BOOK_PATH):
+    openings = []
+    with open(path, "r") as bookFile:
+        for line in bookFile:
+            sans = [token.split(".")[-1] for token in line.split()]
+            sans = [san for san in sans if san != ""]
+            if sans:
+                openings.append(sans)
+    return openings
+
+
+def pickOpening(openings, rng, minPlies=2, maxPlies=8):
+    line = rng.choice(openings)
+    return line[:min(len(line), rng.randint(minPlies, maxPlies))]
+
+
+def playGame(opening, white, black, maxPlies=MAX_PLIES):
+    # white and black are engine settings: {"name", "maxDepth", "timeLimit"}
+    smartMoveFinder.inBook = False
+    smartMoveFinder.transpositionTable.clear()
+    smartMoveFinder.historyScores.clear()
+    gs = BitboardGameState()
+    sans = []
+    stats = {white["name"]: [0, 0.0], black["name"]: [0, 0.0]}
+    resignCount = 0
+    resignScore = 0
+    drawCount = 0
+    result = None
+    termination = "normal"
+
+    for san in opening:
+        validMoves = gs.get_valid_moves()
+        move = gs.move_from_san(san, validMoves)
+        sans.append(gs.get_san(move, validMoves))
+        gs.make_move(move)
+
+    while result is None:
+        validMoves = gs.get_valid_moves()
+        if gs.checkmate:
+            result = "0-1" if gs.whiteToMove else "1-0"
+            break
+        if gs.stalemate:
+            result = "1/2-1/2"
+            break
+        if len(gs.moveLog) >= maxPlies:
+            result = "1/2-1/2"
+            termination = "adjudication"
+            break
+
+        engine = white if gs.whiteToMove else black
+        start = time.perf_counter()
+        move = smartMoveFinder.findBestMove(gs, validMoves, maxDepth=engine["maxDepth"],
+                                            timeLimit=engine["timeLimit"], workers=1)
+        stats[engine["name"]][0] += smartMoveFinder.nodesSearched
+        stats[engine["name"]][1] += time.perf_counter() - start
+        if move is None:
+            move = validMoves[0]
+        sans.append(gs.get_san(move, validMoves))
+
+        # scores are from the mover's side; both engines must agree for a few plies before adjudicating, so a run
+        # of lopsided scores starts again whenever the side they favour changes
+        score = smartMoveFinder.searchScore if gs.whiteToMove else -smartMoveFinder.searchScore
+        if abs(score) < RESIGN_SCORE:
+            resignCount = 0
+        elif (score > 0) == (resignScore > 0):
+            resignCount += 1
+        else:
+            resignCount = 1
+        resignScore = score
+        drawCount = drawCount + 1 if abs(score) <= DRAW_SCORE and len(gs.moveLog) >= DRAW_START_PLY else 0
+        gs.make_move(move)
+        if resignCount >= RESIGN_PLIES:
+            result = "1-0" if score > 0 else "0-1"
+            termination = "adjudication"
+        elif drawCount >= DRAW_PLIES:
+            result = "1/2-1/2"
+            termination = "adjudication"
+
+    return {"white": white["name"], "black": black["name"], "result": result, "termination": termination,
+            "moves": sans, "opening": " ".join(opening), "stats": stats}
+
+
+def formatPgn(game, round_):
+    headers = [("Event", "smartMoveFinder arena"), ("Site", "local"), ("Date", time.strftime("%Y.%m.%d")),
+               ("Round", str(round_)), ("White", game["white"]), ("Black", game["black"]),
+               ("Result", game["result"]), ("Opening", game["opening"]), ("Termination", game["termination"])]
+    lines = ['[%s "%s"]' % header for header in headers]
+    lines.append("")
+    tokens = []
+    for i, san in enumerate(game["moves"]):
+        if i % 2 == 0:
+            tokens.append("%d." % (i // 2 + 1))
+        tokens.append(san)
+    tokens.append(game["result"])
+    line = ""
+    for token in tokens:
+        if len(line) + len(token) + 1 > 80:
+            lines.append(line)
+            line = token
+        else:
+            line = token if line == "" else line + " " + token
+    lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+
+def eloDifference(score, games):
+    if games == 0:
+        return 0.0
+    fraction = min(max(score / games, 1e-3), 1 - 1e-3)
+    return -400 * math.log10(1 / fraction - 1)
+
+
+def runArena(games, engineA, engineB, workers, pgnPath, seed=None, maxPlies=MAX_PLIES, out=sys.stdout):
+    rng = random.Random(seed)
+    openings = loadOpenings()
+    schedule = []
+    for i in range(games):
+        # each opening is played twice with colours reversed so neither engine gets the better side
+        if i % 2 == 0:
+            opening = pickOpening(openings, rng)
+        white, black = (engineA, engineB) if i % 2 == 0 else (engineB, engineA)
+        schedule.append((i + 1, opening, white, black))
+
+    score = {engineA["name"]: 0.0, engineB["name"]: 0.0}
+    wins = draws = losses = 0
+    totals = {engineA["name"]: [0, 0.0], engineB["name"]: [0, 0.0]}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(pgnPath, "w") as pgnFile:
+        futures = {pool.submit(playGame, opening, white, black, maxPlies): round_ for round_, opening, white, black in schedule}
+        for future in as_completed(futures):
+            game = future.result()
+            pgnFile.write(formatPgn(game, futures[future]))
+            pgnFile.flush()
+            if game["result"] == "1/2-1/2":
+                score[game["white"]] += 0.5
+                score[game["black"]] += 0.5
+                draws += 1
+            else:
+                winner = game["white"] if game["result"] == "1-0" else game["black"]
+                score[winner] += 1
+                if winner == engineA["name"]:
+                    wins += 1
+                else:
+                    losses += 1
+            for name, (nodes, seconds) in game["stats"].items():
+                totals[name][0] += nodes
+                totals[name][1] += seconds
+            out.write("game %d: %s - %s %s (%s)\n" % (futures[future], game["white"], game["black"],
+                                                      game["result"], game["termination"]))
+    elapsed = time.perf_counter() - start
+
+    played = wins + draws + losses
+    out.write("%s vs %s: +%d =%d -%d, score %.1f/%d, Elo %+.0f\n" % (
+        engineA["name"], engineB["name"], wins, draws, losses, score[engineA["name"]], played,
+        eloDifference(score[engineA["name"]], played)))
+    for name, (nodes, seconds) in totals.items():
+        out.write("%s: %d nodes, %d nps\n" % (name, nodes, nodes / seconds if seconds else 0))
+    out.write("%.1f games per hour\n" % (played * 3600 / elapsed if elapsed else 0))
+    return score
+
+
+def engineSettings(name, depth, seconds):
+    if depth is None and seconds is None:
+        depth = smartMoveFinder.DEPTH
+    return {"name": name, "maxDepth": depth if depth is not None else smartMoveFinder.MAX_DEPTH, "timeLimit": seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play engine-vs-engine games in parallel and write PGN.")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None, help="processes to play games in (default: all cores)")
+    parser.add_argument("--depth-a", type=int, default=None)
+    parser.add_argument("--time-a", type=float, default=None, help="seconds per move for engine A")
+    parser.add_argument("--depth-b", type=int, default=None)
+    parser.add_argument("--time-b", type=float, default=None, help="seconds per move for engine B")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES, help="plies before a game is scored as a draw")
+    parser.add_argument("--pgn", default="arena.pgn")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    engineA = engineSettings("A", args.depth_a, args.time_a)
+    engineB = engineSettings("B", args.depth_b, args.time_b)
+    runArena(args.games, engineA, engineB, args.workers, args.pgn, args.seed, args.max_plies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import json
+import sys
+import time
+
+import smartMoveFinder
+from chessEngine import coordinates
+from perft import BACKENDS, loadPosition
+
+BENCH_POSITIONS = [
+    ("italian", "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("closed", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"),
+    ("symmetric", "r2q1rk1/pp2bppp/2n1pn2/3p4/3P4/2NBPN2/PP3PPP/R2Q1RK1 w - - 0 10"),
+    ("rook-ending", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"),
+    ("knight-pawns", "6k1/6p1/6Pp/ppp5/3pn2P/1P3K2/1PP2P2/3N4 b - - 0 1"),
+    ("pawn-ending", "8/5k2/8/3K4/8/8/3P4/8 w - - 0 1"),
+]
+
+
+def benchPosition(name, fen, maxDepth, timeLimit=None, backend="bitboard"):
+    gs = loadPosition(fen, backend)
+    # every position starts cold so results do not depend on the order they run in
+    smartMoveFinder.transpositionTable.clear()
+    smartMoveFinder.historyScores.clear()
+    iterations = []
+
+    def onIteration(depth, score, move, nodes, seconds):
+        iterations.append({"depth": depth, "score": round(score, 4), "move": coordinates(move),
+                           "nodes": nodes, "time": round(seconds, 4)})
+
+    start = time.perf_counter()
+    move = smartMoveFinder.findBestMove(gs, gs.get_valid_moves(), maxDepth=maxDepth, timeLimit=timeLimit,
+                                        workers=1, onIteration=onIteration)
+    elapsed = time.perf_counter() - start
+    nodes = smartMoveFinder.nodesSearched
+    return {"name": name, "fen": fen, "move": coordinates(move), "depth": smartMoveFinder.completedDepth,
+            "score": round(smartMoveFinder.searchScore, 4), "nodes": nodes, "time": round(elapsed, 4),
+            "nps": round(nodes / elapsed) if elapsed else 0, "iterations": iterations}
+
+
+def runBenchmark(maxDepth, timeLimit=None, backend="bitboard", out=sys.stdout):
+    # the book and the tablebase would answer some positions without searching them at all
+    inBook, useTablebase = smartMoveFinder.inBook, smartMoveFinder.USE_TABLEBASE
+    smartMoveFinder.inBook = False
+    smartMoveFinder.USE_TABLEBASE = False
+    results = []
+    try:
+        for name, fen in BENCH_POSITIONS:
+            result = benchPosition(name, fen, maxDepth, timeLimit, backend)
+            results.append(result)
+            out.write("%-12s %-5s depth %2d  %9d nodes  %7.2fs  %7d nps\n" % (
+                name, result["move"], result["depth"], result["nodes"], result["time"], result["nps"]))
+    finally:
+        smartMoveFinder.inBook = inBook
+        smartMoveFinder.USE_TABLEBASE = useTablebase
+    totalNodes = sum(result["nodes"] for result in results)
+    totalTime = sum(result["time"] for result in results)
+    out.write("total %d nodes in %.2fs, %d nps\n" % (totalNodes, totalTime, totalNodes / totalTime if totalTime else 0))
+    return {"maxDepth": maxDepth, "timeLimit": timeLimit, "backend": backend, "totalNodes": totalNodes,
+            "totalTime": round(totalTime, 4), "nps": round(totalNodes / totalTime) if totalTime else 0,
+            "positions": results}
+
+
+def compareWithBaseline(report, baseline, tolerance, out=sys.stdout):
+    # returns the list of regressions: slower time to the same depth, or lower nodes per second
+    regressions = []
+    baselinePositions = {result["name"]: result for result in baseline["positions"]}
+    for result in report["positions"]:
+        old = baselinePositions.get(result["name"])
+        if old is None:
+            continue
+        oldTimes = {iteration["depth"]: iteration["time"] for iteration in old["iterations"]}
+        for iteration in result["iterations"]:
+            oldTime = oldTimes.get(iteration["depth"])
+            if oldTime and iteration["time"] > oldTime * (1 + tolerance) and iteration["time"] - oldTime > 0.05:
+                regressions.append("%s: depth %d took %.2fs (baseline %.2fs)" % (
+                    result["name"], iteration["depth"], iteration["time"], oldTime))
+        if result["move"] != old["move"]:
+            out.write("%s: move changed %s -> %s\n" % (result["name"], old["move"], result["move"]))
+        if result["nodes"] != old["nodes"]:
+            out.write("%s: nodes %d -> %d\n" % (result["name"], old["nodes"], result["nodes"]))
+    if baseline["nps"] and report["nps"] < baseline["nps"] * (1 - tolerance):
+        regressions.append("total nps %d (baseline %d)" % (report["nps"], baseline["nps"]))
+    for regression in regressions:
+        out.write("REGRESSION " + regression + "\n")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark findBestMove over fixed positions.")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--time", type=float, default=None, help="seconds per position instead of a fixed depth")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="bitboard")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown as a fraction")
+    parser.add_argument("--stats-log", help="append search statistics for every position to this JSON-lines file")
+    parser.add_argument("--no-null-move", action="store_true", help="disable null-move pruning")
+    parser.add_argument("--no-lmr", action="store_true", help="disable late move reductions")
+    parser.add_argument("--no-pvs", action="store_true", help="disable principal variation search")
+    parser.add_argument("--no-aspiration", action="store_true", help="search every iteration with a full window")
+    args = parser.parse_args()
+
+    smartMoveFinder.NULL_MOVE_PRUNING = not args.no_null_move
+    smartMoveFinder.LATE_MOVE_REDUCTIONS = not args.no_lmr
+    smartMoveFinder.PRINCIPAL_VARIATION_SEARCH = not args.no_pvs
+    smartMoveFinder.ASPIRATION_WINDOWS = not args.no_aspiration
+    if args.stats_log:
+        smartMoveFinder.enableSearchStats(logPath=args.stats_log)
+
+    report = runBenchmark(args.depth, args.time, args.backend)
+    if args.output:
+        with open(args.output, "w") as outputFile:
+            json.dump(report, outputFile, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baselineFile:
+            baseline = json.load(baselineFile)
+        if compareWithBaseline(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
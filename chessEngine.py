@@ -0,0 +1,1125 @@
+import random
+
+zobristRandom = random.Random(20230101)
+zobristPieces = {piece: [[zobristRandom.getrandbits(64) for c in range(8)] for r in range(8)]
+                 for piece in ("wp", "wR", "wN", "wB", "wQ", "wK", "bp", "bR", "bN", "bB", "bQ", "bK")}
+zobristBlackToMove = zobristRandom.getrandbits(64)
+zobristCastling = {"wks": zobristRandom.getrandbits(64), "bks": zobristRandom.getrandbits(64),
+                   "wqs": zobristRandom.getrandbits(64), "bqs": zobristRandom.getrandbits(64)}
+# indexed by CastleRights.pack()
+zobristCastlingKeys = [(zobristCastling["wks"] if bits & 1 else 0) ^ (zobristCastling["bks"] if bits & 2 else 0) ^
+                       (zobristCastling["wqs"] if bits & 4 else 0) ^ (zobristCastling["bqs"] if bits & 8 else 0)
+                       for bits in range(16)]
+zobristEnpassent = [zobristRandom.getrandbits(64) for c in range(8)]
+
+MATERIAL_WEIGHT = 1.5
+pieceValues = {"K": 0, "Q": 9, "R": 5, "B": 3, "N": 3, "p": 1}
+
+
+def build_piece_square_tables():
+    # tables are written from white's side (row 0 is the eighth rank) and mirrored for black
+    centre = [[0.1 if 3 <= r <= 4 and 3 <= c <= 4 else 0.05 if 2 <= r <= 5 and 2 <= c <= 5 else 0
+               for c in range(8)] for r in range(8)]
+    white_tables = {
+        "p": [[centre[r][c] + (0.05 * (6 - r) if 1 <= r <= 5 else 0) for c in range(8)] for r in range(8)],
+        "N": [[centre[r][c] * 2 - (0.05 if c in (0, 7) else 0) - (0.1 if r == 7 else 0) for c in range(8)]
+              for r in range(8)],
+        "B": [[centre[r][c] * 2 - (0.1 if r == 7 else 0) for c in range(8)] for r in range(8)],
+        "R": [[0.1 if r == 1 else 0 for c in range(8)] for r in range(8)],
+        "Q": [[centre[r][c] * 0.5 for c in range(8)] for r in range(8)],
+        "K": [[0.0] * 8 for r in range(8)],
+    }
+    tables = {}
+    for kind, table in white_tables.items():
+        tables["w" + kind] = table
+        tables["b" + kind] = [[-table[7 - r][c] for c in range(8)] for r in range(8)]
+    return tables
+
+
+pieceSquareTables = build_piece_square_tables()
+materialValues = {colour + kind: (1 if colour == "w" else -1) * value * MATERIAL_WEIGHT
+                  for colour in "wb" for kind, value in pieceValues.items()}
+
+
+class GameState:
+    ranks_to_rows = {"1": 7, "2": 6, "3": 5, "4": 4, "5": 3, "6": 2, "7": 1, "8": 0}
+    rows_to_ranks = {v: k for k, v in ranks_to_rows.items()}
+    files_to_col = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4, "f": 5, "g": 6, "h": 7}
+    col_to_files = {v: k for k, v in files_to_col.items()}
+
+    def __init__(self):
+        self.board = [
+            ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
+            ["bp", "bp", "bp", "bp", "bp", "bp", "bp", "bp"],
+            ["--", "--", "--", "--", "--", "--", "--", "--"],
+            ["--", "--", "--", "--", "--", "--", "--", "--"],
+            ["--", "--", "--", "--", "--", "--", "--", "--"],
+            ["--", "--", "--", "--", "--", "--", "--", "--"],
+            ["wp", "wp", "wp", "wp", "wp", "wp", "wp", "wp"],
+            ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"],
+        ]
+        self.move_functions = {"p": self.get_pawn_moves, "R": self.get_rook_moves, "N": self.get_knight_moves,
+                               "B": self.get_bishop_moves, "Q": self.get_queen_moves, "K": self.get_king_moves}
+
+        self.whiteToMove = True
+        self.moveLog = []
+        self.moveList = []
+        self.white_king_loc = (7, 4)
+        self.black_king_loc = (0, 4)
+        self.checkmate = False
+        self.stalemate = False
+        self.enpassentPossible = ()
+        self.currentCastlingRight = CastleRights(True, True, True, True)
+        self.stateLog = [self.pack_state(0)]
+        self.startPly = 0
+        self.is_castled = False
+        self.inCheck = False
+        self.pins = {}
+        self.checks = []
+        self.zobristKey = self.compute_zobrist_key()
+        self.zobristLog = []
+        self.compute_eval()
+
+    def set_fen(self, fen):
+        fields = fen.split()
+        self.board = []
+        for rank in fields[0].split("/"):
+            row = []
+            for letter in rank:
+                if letter.isdigit():
+                    row.extend(["--"] * int(letter))
+                else:
+                    row.append(("w" if letter.isupper() else "b") + ("p" if letter in "Pp" else letter.upper()))
+            self.board.append(row)
+        for r in range(8):
+            for c in range(8):
+                if self.board[r][c] == "wK":
+                    self.white_king_loc = (r, c)
+                elif self.board[r][c] == "bK":
+                    self.black_king_loc = (r, c)
+
+        self.whiteToMove = len(fields) < 2 or fields[1] == "w"
+        castling = fields[2] if len(fields) > 2 else "-"
+        self.currentCastlingRight = CastleRights("K" in castling, "k" in castling, "Q" in castling, "q" in castling)
+        enpassent = fields[3] if len(fields) > 3 else "-"
+        if enpassent == "-":
+            self.enpassentPossible = ()
+        else:
+            self.enpassentPossible = (self.ranks_to_rows[enpassent[1]], self.files_to_col[enpassent[0]])
+        # startPly lets get_fen rebuild the move number
+        self.stateLog = [self.pack_state(int(fields[4]) if len(fields) > 4 else 0)]
+        fullmove = int(fields[5]) if len(fields) > 5 else 1
+        self.startPly = 2 * (fullmove - 1) + (0 if self.whiteToMove else 1)
+
+        self.moveLog = []
+        self.moveList = []
+        self.checkmate = False
+        self.stalemate = False
+        self.is_castled = False
+        self.zobristKey = self.compute_zobrist_key()
+        self.zobristLog = []
+        self.compute_eval()
+
+    def compute_eval(self):
+        self.materialScore = 0
+        self.positionScore = 0
+        self.pieceCounts = {piece: 0 for piece in materialValues}
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece != "--":
+                    self.materialScore += materialValues[piece]
+                    self.positionScore += pieceSquareTables[piece][r][c]
+                    self.pieceCounts[piece] += 1
+
+    def update_eval(self, move, sign):
+        # sign is 1 when the move is made and -1 when it is taken back
+        placed = move.piece_move[0] + "Q" if move.is_pawn_promotion else move.piece_move
+        material = materialValues[placed] - materialValues[move.piece_move]
+        position = pieceSquareTables[placed][move.end_row][move.end_col] - \
+            pieceSquareTables[move.piece_move][move.start_row][move.start_col]
+        if move.piece_captured != "--":
+            capture_row = move.start_row if move.is_enpassent else move.end_row
+            material -= materialValues[move.piece_captured]
+            position -= pieceSquareTables[move.piece_captured][capture_row][move.end_col]
+            self.pieceCounts[move.piece_captured] -= sign
+        if move.is_pawn_promotion:
+            self.pieceCounts[move.piece_move] -= sign
+            self.pieceCounts[placed] += sign
+        if move.is_castle:
+            rook_table = pieceSquareTables[move.piece_move[0] + "R"][move.end_row]
+            if move.end_col - move.start_col == 2:
+                position += rook_table[move.end_col - 1] - rook_table[move.end_col + 1]
+            else:
+                position += rook_table[move.end_col + 1] - rook_table[move.end_col - 2]
+        self.materialScore += sign * material
+        self.positionScore += sign * position
+
+    def compute_zobrist_key(self):
+        key = 0
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece != "--":
+                    key ^= zobristPieces[piece][r][c]
+        if not self.whiteToMove:
+            key ^= zobristBlackToMove
+        key ^= self.castle_rights_key()
+        key ^= self.enpassent_key()
+        return key
+
+    def enpassent_key(self):
+        # the en passant file is only hashed when a pawn of the side to move stands beside the pushed pawn, so a
+        # double push nobody can capture transposes with the same position reached by single steps
+        if self.enpassentPossible == ():
+            return 0
+        row, col = self.enpassentPossible
+        if self.whiteToMove:
+            pawn_row, pawn = row + 1, "wp"
+        else:
+            pawn_row, pawn = row - 1, "bp"
+        if (col > 0 and self.board[pawn_row][col - 1] == pawn) or (col < 7 and self.board[pawn_row][col + 1] == pawn):
+            return zobristEnpassent[col]
+        return 0
+
+    def pack_state(self, halfmoveClock):
+        # one int per ply for undo: castling rights in bits 0-3, en passant file + 1 in bits 4-7, fifty-move clock above
+        enpassent = self.enpassentPossible[1] + 1 if self.enpassentPossible != () else 0
+        return self.currentCastlingRight.pack() | enpassent << 4 | halfmoveClock << 8
+
+    def castle_rights_key(self):
+        return zobristCastlingKeys[self.currentCastlingRight.pack()]
+
+    def get_fen(self):
+        ranks = []
+        for row in self.board:
+            rank = ""
+            empty = 0
+            for piece in row:
+                if piece == "--":
+                    empty += 1
+                    continue
+                if empty != 0:
+                    rank += str(empty)
+                    empty = 0
+                letter = "P" if piece[1] == "p" else piece[1]
+                rank += letter if piece[0] == "w" else letter.lower()
+            if empty != 0:
+                rank += str(empty)
+            ranks.append(rank)
+        fen = "/".join(ranks)
+
+        fen += " w " if self.whiteToMove else " b "
+
+        castling = ""
+        if self.currentCastlingRight.wks:
+            castling += "K"
+        if self.currentCastlingRight.wqs:
+            castling += "Q"
+        if self.currentCastlingRight.bks:
+            castling += "k"
+        if self.currentCastlingRight.bqs:
+            castling += "q"
+        fen += castling if castling != "" else "-"
+
+        if self.enpassentPossible != ():
+            fen += " " + self.col_to_files[self.enpassentPossible[1]] + self.rows_to_ranks[self.enpassentPossible[0]]
+        else:
+            fen += " -"
+
+        fen += " %d %d" % (self.stateLog[-1] >> 8, (self.startPly + len(self.moveLog)) // 2 + 1)
+        return fen
+
+    def make_move(self, move):
+        self.zobristLog.append(self.zobristKey)
+        key = self.zobristKey ^ zobristBlackToMove ^ self.castle_rights_key()
+        key ^= zobristPieces[move.piece_move][move.start_row][move.start_col]
+        if move.is_enpassent:
+            key ^= zobristPieces[move.piece_captured][move.start_row][move.end_col]
+        elif move.piece_captured != "--":
+            key ^= zobristPieces[move.piece_captured][move.end_row][move.end_col]
+        key ^= self.enpassent_key()
+
+        self.board[move.start_row][move.start_col] = "--"
+        self.board[move.end_row][move.end_col] = move.piece_move
+        self.moveLog.append(move)
+        self.whiteToMove = not self.whiteToMove
+        if move.piece_move == "wK":
+            self.white_king_loc = (move.end_row, move.end_col)
+        if move.piece_move == "bK":
+            self.black_king_loc = (move.end_row, move.end_col)
+
+        if move.is_pawn_promotion:
+            self.board[move.end_row][move.end_col] = move.piece_move[0] + "Q"
+        key ^= zobristPieces[self.board[move.end_row][move.end_col]][move.end_row][move.end_col]
+
+        if move.is_enpassent:
+            self.board[move.start_row][move.end_col] = "--"
+
+        if (move.piece_move[1]) == "p" and (abs(move.start_row - move.end_row) == 2):
+            self.enpassentPossible = ((move.start_row + move.end_row)//2, move.start_col)
+            key ^= self.enpassent_key()
+        else:
+            self.enpassentPossible = ()
+
+        if move.is_castle:
+            self.is_castled = True
+            rook = move.piece_move[0] + "R"
+            if move.end_col - move.start_col == 2:  # kingside
+                self.board[move.end_row][move.end_col - 1] = self.board[move.end_row][move.end_col + 1]
+                self.board[move.end_row][move.end_col + 1] = "--"
+                key ^= zobristPieces[rook][move.end_row][move.end_col + 1] ^ zobristPieces[rook][move.end_row][move.end_col - 1]
+            else:  # queenside
+                self.board[move.end_row][move.end_col + 1] = self.board[move.end_row][move.end_col - 2]
+                self.board[move.end_row][move.end_col - 2] = "--"
+                key ^= zobristPieces[rook][move.end_row][move.end_col - 2] ^ zobristPieces[rook][move.end_row][move.end_col + 1]
+
+        self.updateCastleRights(move)
+        self.stateLog.append(self.pack_state(0 if move.piece_move[1] == "p" or move.piece_captured != "--"
+                                             else (self.stateLog[-1] >> 8) + 1))
+        self.zobristKey = key ^ self.castle_rights_key()
+        self.update_eval(move, 1)
+
+    def make_null_move(self):
+        # passes the turn for null-move pruning; the None it logs is taken back by undo_move
+        self.zobristLog.append(self.zobristKey)
+        self.zobristKey ^= zobristBlackToMove ^ self.enpassent_key()
+        self.enpassentPossible = ()
+        self.moveLog.append(None)
+        self.whiteToMove = not self.whiteToMove
+        # a zero clock also stops repetition checks from looking back across the null move
+        self.stateLog.append(self.pack_state(0))
+
+    def undo_move(self):
+        if len(self.moveLog) != 0:
+            move = self.moveLog.pop()
+            if move is None:
+                self.whiteToMove = not self.whiteToMove
+                self.stateLog.pop()
+                state = self.stateLog[-1]
+                self.enpassentPossible = () if state & 240 == 0 else (2 if self.whiteToMove else 5, (state >> 4 & 15) - 1)
+                self.zobristKey = self.zobristLog.pop()
+                self.checkmate = False
+                self.stalemate = False
+                return
+            self.board[move.start_row][move.start_col] = move.piece_move
+            self.board[move.end_row][move.end_col] = move.piece_captured
+            self.whiteToMove = not self.whiteToMove
+            if move.piece_move == "wK":
+                self.white_king_loc = (move.start_row, move.start_col)
+            if move.piece_move == "bK":
+                self.black_king_loc = (move.start_row, move.start_col)
+
+            if move.is_enpassent:
+                self.board[move.end_row][move.end_col] = "--"
+                self.board[move.start_row][move.end_col] = move.piece_captured
+
+            self.stateLog.pop()
+            state = self.stateLog[-1]
+            self.currentCastlingRight.unpack(state & 15)
+            # the en passant square is always on the sixth rank of the side to move
+            self.enpassentPossible = () if state & 240 == 0 else (2 if self.whiteToMove else 5, (state >> 4 & 15) - 1)
+
+            if move.is_castle:
+                self.is_castled = False
+                if move.end_col - move.start_col == 2:
+                    self.board[move.end_row][move.end_col + 1] = self.board[move.end_row][move.end_col - 1]
+                    self.board[move.end_row][move.end_col - 1] = "--"
+                else:
+                    self.board[move.end_row][move.end_col - 2] = self.board[move.end_row][move.end_col + 1]
+                    self.board[move.end_row][move.end_col + 1] = "--"
+
+            self.zobristKey = self.zobristLog.pop()
+            self.update_eval(move, -1)
+            self.checkmate = False
+            self.stalemate = False
+
+
+
+    def get_san(self, move, validMoves=None):
+        # standard algebraic notation for a move that has not been made yet
+        if validMoves is None:
+            validMoves = self.get_valid_moves()
+        if move.is_castle:
+            san = "O-O" if move.end_col > move.start_col else "O-O-O"
+        elif move.piece_move[1] == "p":
+            san = ""
+            if move.piece_captured != "--":
+                san = self.col_to_files[move.start_col] + "x"
+            san += move.get_rank_file(move.end_row, move.end_col)
+            if move.is_pawn_promotion:
+                san += "=Q"
+        else:
+            rivals = [other for other in validMoves if other.piece_move == move.piece_move and other != move
+                      and other.end_row == move.end_row and other.end_col == move.end_col]
+            qualifier = ""
+            if rivals:
+                if all(other.start_col != move.start_col for other in rivals):
+                    qualifier = self.col_to_files[move.start_col]
+                elif all(other.start_row != move.start_row for other in rivals):
+                    qualifier = self.rows_to_ranks[move.start_row]
+                else:
+                    qualifier = move.get_rank_file(move.start_row, move.start_col)
+            san = move.piece_move[1] + qualifier + ("x" if move.piece_captured != "--" else "") + \
+                move.get_rank_file(move.end_row, move.end_col)
+
+        checkmate, stalemate, in_check = self.checkmate, self.stalemate, self.inCheck
+        self.make_move(move)
+        self.get_valid_moves()
+        if self.checkmate:
+            san += "#"
+        elif self.inCheck:
+            san += "+"
+        self.undo_move()
+        self.checkmate, self.stalemate, self.inCheck = checkmate, stalemate, in_check
+        return san
+
+    def move_from_san(self, san, validMoves=None):
+        if validMoves is None:
+            validMoves = self.get_valid_moves()
+        san = san.rstrip("+#!?")
+        if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+            kingside = len(san) == 3
+            for move in validMoves:
+                if move.is_castle and (move.end_col > move.start_col) == kingside:
+                    return move
+            return None
+
+        san = san.split("=")[0]
+        piece = san[0] if san[0] in "KQRBN" else "p"
+        if piece != "p":
+            san = san[1:]
+        end_col = self.files_to_col.get(san[-2])
+        end_row = self.ranks_to_rows.get(san[-1])
+        qualifier = san[:-2].replace("x", "")
+        for move in validMoves:
+            if move.piece_move[1] != piece or move.end_row != end_row or move.end_col != end_col:
+                continue
+            if any(ch in self.files_to_col and self.files_to_col[ch] != move.start_col or
+                   ch in self.ranks_to_rows and self.ranks_to_rows[ch] != move.start_row for ch in qualifier):
+                continue
+            return move
+        return None
+
+    def updateCastleRights(self, move):
+        if move.piece_move == "wK":
+            self.currentCastlingRight.wks = False
+            self.currentCastlingRight.wqs = False
+        elif move.piece_move == "bK":
+            self.currentCastlingRight.bks = False
+            self.currentCastlingRight.bqs = False
+        elif move.piece_move == "wR":
+            if move.start_row == 7:
+                if move.start_col == 0:
+                    self.currentCastlingRight.wqs = False
+                elif move.start_col == 7:
+                    self.currentCastlingRight.wks = False
+        elif move.piece_move == "bR":
+            if move.start_row == 0:
+                if move.start_col == 0:
+                    self.currentCastlingRight.bqs = False
+                elif move.start_col == 7:
+                    self.currentCastlingRight.bks = False
+
+        if move.piece_captured == "wR" and move.end_row == 7:
+            if move.end_col == 0:
+                self.currentCastlingRight.wqs = False
+            elif move.end_col == 7:
+                self.currentCastlingRight.wks = False
+        elif move.piece_captured == "bR" and move.end_row == 0:
+            if move.end_col == 0:
+                self.currentCastlingRight.bqs = False
+            elif move.end_col == 7:
+                self.currentCastlingRight.bks = False
+
+    def get_valid_moves(self):
+        moves = self.get_legal_moves()
+
+        if len(moves) == 0:
+            if self.inCheck:
+                self.checkmate = True
+            else:
+                self.stalemate = True
+        else:
+            self.checkmate = False
+            self.stalemate = False
+
+        if not self.checkmate and self.checkDraw():
+            self.stalemate = True
+
+        return moves
+
+    def get_legal_moves(self):
+        if self.whiteToMove:
+            king_row, king_col = self.white_king_loc
+        else:
+            king_row, king_col = self.black_king_loc
+        self.inCheck, self.pins, self.checks = self.check_for_pins_and_checks(king_row, king_col)
+
+        if self.inCheck:
+            if len(self.checks) == 1:
+                check_row, check_col, d_row, d_col = self.checks[0]
+                if self.board[check_row][check_col][1] == "N":
+                    valid_squares = {(check_row, check_col)}
+                else:
+                    valid_squares = set()
+                    for i in range(1, 8):
+                        square = (king_row + d_row * i, king_col + d_col * i)
+                        valid_squares.add(square)
+                        if square == (check_row, check_col):
+                            break
+                moves = [move for move in self.get_all_possible_moves()
+                         if move.piece_move[1] == "K" or (move.end_row, move.end_col) in valid_squares
+                         or (move.is_enpassent and (move.start_row, move.end_col) == (check_row, check_col))]
+            else:
+                moves = []
+                self.get_king_moves(king_row, king_col, moves)
+        else:
+            moves = self.get_all_possible_moves()
+            self.get_castle_moves(king_row, king_col, moves)
+        return moves
+
+    def checkDraw(self):
+        # threefold repetition, the fifty-move rule, or no mating material left
+        return self.stateLog[-1] >> 8 >= 100 or self.repetitions() >= 2 or self.insufficient_material()
+
+    def repetitions(self):
+        # earlier occurrences of the current position, looking back no further than the last capture or pawn move
+        count = 0
+        for i in range(len(self.zobristLog) - 2, max(len(self.zobristLog) - (self.stateLog[-1] >> 8), 0) - 1, -2):
+            if self.zobristLog[i] == self.zobristKey:
+                count += 1
+        return count
+
+    def insufficient_material(self):
+        counts = self.pieceCounts
+        if counts["wp"] or counts["bp"] or counts["wR"] or counts["bR"] or counts["wQ"] or counts["bQ"]:
+            return False
+        return counts["wN"] + counts["wB"] + counts["bN"] + counts["bB"] <= 1
+
+    def in_check(self):
+        if self.whiteToMove:
+            return self.sq_under_attack(self.white_king_loc[0], self.white_king_loc[1])
+        return self.sq_under_attack(self.black_king_loc[0], self.black_king_loc[1])
+
+    def sq_under_attack(self, r, c):
+        # looks outward from the square through the precomputed tables, one piece type at a time
+        board = self.board
+        sq = r * 8 + c
+        if self.whiteToMove:
+            knight, king, pawn, rook, bishop, queen = "bN", "bK", "bp", "bR", "bB", "bQ"
+            pawn_squares = PAWN_SQUARES["w"][sq]
+        else:
+            knight, king, pawn, rook, bishop, queen = "wN", "wK", "wp", "wR", "wB", "wQ"
+            pawn_squares = PAWN_SQUARES["b"][sq]
+        for end_row, end_col in KNIGHT_SQUARES[sq]:
+            if board[end_row][end_col] == knight:
+                return True
+        for end_row, end_col in pawn_squares:
+            if board[end_row][end_col] == pawn:
+                return True
+        for end_row, end_col in KING_SQUARES[sq]:
+            if board[end_row][end_col] == king:
+                return True
+        rays = RAY_SQUARES[sq]
+        for j in range(8):
+            slider = rook if j < 4 else bishop
+            for end_row, end_col in rays[j]:
+                end_piece = board[end_row][end_col]
+                if end_piece != "--":
+                    if end_piece == slider or end_piece == queen:
+                        return True
+                    break
+        return False
+
+    def attacks_along(self, piece, direction, distance):
+        # direction indexes the directions tuple used by the ray scans: 0-3 orthogonal, 4-7 diagonal,
+        # looking outward from the attacked square
+        kind = piece[1]
+        if kind == "Q":
+            return True
+        if direction < 4:
+            return kind == "R" or (kind == "K" and distance == 1)
+        if kind == "B" or (kind == "K" and distance == 1):
+            return True
+        if kind == "p" and distance == 1:
+            # a white pawn attacks upwards so it sits below the square, a black pawn above it
+            return (piece[0] == "w" and direction >= 6) or (piece[0] == "b" and direction <= 5)
+        return False
+
+    def check_for_pins_and_checks(self, r, c):
+        pins = {}
+        checks = []
+        ally_colour = "w" if self.whiteToMove else "b"
+        rays = RAY_SQUARES[r * 8 + c]
+        for j in range(8):
+            d = MAILBOX_DIRECTIONS[j]
+            possible_pin = ()
+            i = 0
+            for end_row, end_col in rays[j]:
+                i += 1
+                end_piece = self.board[end_row][end_col]
+                if end_piece == "--":
+                    continue
+                if end_piece[0] == ally_colour:
+                    if possible_pin == ():
+                        possible_pin = (end_row, end_col)
+                        continue
+                    break
+                if self.attacks_along(end_piece, j, i):
+                    if possible_pin == ():
+                        checks.append((end_row, end_col, d[0], d[1]))
+                    else:
+                        pins[possible_pin] = d
+                break
+
+        enemy_knight = ("b" if self.whiteToMove else "w") + "N"
+        for end_row, end_col in KNIGHT_SQUARES[r * 8 + c]:
+            if self.board[end_row][end_col] == enemy_knight:
+                checks.append((end_row, end_col, end_row - r, end_col - c))
+        return len(checks) > 0, pins, checks
+
+    def pin_allows(self, r, c, d_row, d_col):
+        pin = self.pins.get((r, c))
+        return pin is None or pin == (d_row, d_col) or pin == (-d_row, -d_col)
+
+    def enpassent_is_legal(self, move):
+        # the capturing and captured pawns leave the same rank at once, which the pin scan cannot see
+        self.make_move(move)
+        self.whiteToMove = not self.whiteToMove
+        legal = not self.in_check()
+        self.whiteToMove = not self.whiteToMove
+        self.undo_move()
+        return legal
+
+    def get_all_possible_moves(self):
+        moves = []
+        for r in range(len(self.board)):
+            for c in range(len(self.board[r])):
+                turn = self.board[r][c][0]
+                if (turn == "w" and self.whiteToMove) or (turn == "b" and not self.whiteToMove):
+                    piece = self.board[r][c][1]
+                    self.move_functions[piece](r, c, moves)
+
+        return moves
+
+    def get_pawn_moves(self, r, c, moves):
+        if self.whiteToMove:
+            move_amount = -1
+            start_row = 6
+            enemy_colour = "b"
+        else:
+            move_amount = 1
+            start_row = 1
+            enemy_colour = "w"
+
+        if self.board[r + move_amount][c] == "--" and self.pin_allows(r, c, move_amount, 0):
+            moves.append(Move((r, c), (r + move_amount, c), self.board))
+            if r == start_row and self.board[r + 2 * move_amount][c] == "--":
+                moves.append(Move((r, c), (r + 2 * move_amount, c), self.board))
+
+        for d_col in (-1, 1):
+            end_col = c + d_col
+            if 0 <= end_col <= 7 and self.pin_allows(r, c, move_amount, d_col):
+                if self.board[r + move_amount][end_col][0] == enemy_colour:
+                    moves.append(Move((r, c), (r + move_amount, end_col), self.board))
+                elif (r + move_amount, end_col) == self.enpassentPossible:
+                    move = Move((r, c), (r + move_amount, end_col), self.board, isEnpassentMove=True)
+                    if self.enpassent_is_legal(move):
+                        moves.append(move)
+
+    def get_rook_moves(self, r, c, moves):
+        directions = ((-1, 0), (0, -1), (1, 0), (0, 1))
+        self.get_sliding_moves(r, c, directions, moves)
+
+    def get_sliding_moves(self, r, c, directions, moves):
+        enemy_colour = "b" if self.whiteToMove else "w"
+        for d in directions:
+            if not self.pin_allows(r, c, d[0], d[1]):
+                continue
+            for i in range(1, 8):
+                end_row = r + d[0] * i
+                end_col = c + d[1] * i
+                if 0 <= end_row < 8 and 0 <= end_col < 8:
+                    end_piece = self.board[end_row][end_col]
+                    if end_piece == "--":
+                        moves.append(Move((r, c), (end_row, end_col), self.board))
+                    elif end_piece[0] == enemy_colour:
+                        moves.append(Move((r, c), (end_row, end_col), self.board))
+                        break
+                    else:
+                        break
+                else:
+                    break
+
+    def get_knight_moves(self, r, c, moves):
+        if (r, c) in self.pins:
+            return
+        knight_moves = ((-2, -1), (-2, 1), (2, -1), (2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2))
+        ally_colour = "w" if self.whiteToMove else "b"
+        for m in knight_moves:
+            end_row = r + m[0]
+            end_col = c + m[1]
+            if 0 <= end_row < 8 and 0 <= end_col < 8:
+                end_piece = self.board[end_row][end_col]
+                if end_piece[0] != ally_colour:
+                    moves.append(Move((r, c), (end_row, end_col), self.board))
+
+    def get_bishop_moves(self, r, c, moves):
+        directions = ((-1, -1), (1, -1), (-1, 1), (1, 1))
+        self.get_sliding_moves(r, c, directions, moves)
+
+    def get_queen_moves(self, r, c, moves):
+        self.get_bishop_moves(r, c, moves)
+        self.get_rook_moves(r, c, moves)
+
+    def get_king_moves(self, r, c, moves):
+        king_moves = ((1, 1), (-1, 1), (1, -1), (-1, -1), (0, 1), (0, -1), (1, 0), (-1, 0))
+        ally_colour = "w" if self.whiteToMove else "b"
+        king = self.board[r][c]
+        # lift the king so squares behind it on a checking ray are seen as attacked
+        self.board[r][c] = "--"
+        for i in range(8):
+            end_row = r + king_moves[i][0]
+            end_col = c + king_moves[i][1]
+            if 0 <= end_row < 8 and 0 <= end_col < 8:
+                end_piece = self.board[end_row][end_col]
+                if end_piece[0] != ally_colour and not self.sq_under_attack(end_row, end_col):
+                    self.board[r][c] = king
+                    moves.append(Move((r, c), (end_row, end_col), self.board))
+                    self.board[r][c] = "--"
+        self.board[r][c] = king
+
+
+    def get_castle_moves(self, r, c, moves):
+        if self.sq_under_attack(r, c):
+            return
+        if (self.whiteToMove and self.currentCastlingRight.wks) or \
+                (not self.whiteToMove and self.currentCastlingRight.bks):
+            self.kingside_castle_moves(r, c, moves)
+
+        if (self.whiteToMove and self.currentCastlingRight.wqs) or \
+                (not self.whiteToMove and self.currentCastlingRight.bqs):
+            self.queenside_castle_moves(r, c, moves)
+
+    def kingside_castle_moves(self, r, c, moves):
+        if self.board[r][c + 1] == "--" and self.board[r][c + 2] == "--":
+            if not self.sq_under_attack(r, c + 1) and not self.sq_under_attack(r, c + 2):
+                moves.append(Move((r, c), (r, c + 2), self.board, isCastleMove=True))
+
+    def queenside_castle_moves(self, r, c, moves):
+        if self.board[r][c - 1] == "--" and self.board[r][c - 2] == "--" and self.board[r][c - 3] == "--":
+            if not self.sq_under_attack(r, c - 1) and not self.sq_under_attack(r, c - 2):
+                moves.append(Move((r, c), (r, c - 2), self.board, isCastleMove=True))
+
+def square_bit(r, c):
+    return 1 << (r * 8 + c)
+
+
+def build_leaper_table(offsets):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        bb = 0
+        for d_row, d_col in offsets:
+            if 0 <= r + d_row < 8 and 0 <= c + d_col < 8:
+                bb |= square_bit(r + d_row, c + d_col)
+        table.append(bb)
+    return table
+
+
+def build_ray_table(d_row, d_col):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        bb = 0
+        for i in range(1, 8):
+            if not (0 <= r + d_row * i < 8 and 0 <= c + d_col * i < 8):
+                break
+            bb |= square_bit(r + d_row * i, c + d_col * i)
+        table.append(bb)
+    return table
+
+
+def build_leaper_squares(offsets):
+    return [tuple((sq // 8 + d_row, sq % 8 + d_col) for d_row, d_col in offsets
+                  if 0 <= sq // 8 + d_row < 8 and 0 <= sq % 8 + d_col < 8) for sq in range(64)]
+
+
+def build_ray_squares(d_row, d_col):
+    return [tuple((sq // 8 + d_row * i, sq % 8 + d_col * i) for i in range(1, 8)
+                  if 0 <= sq // 8 + d_row * i < 8 and 0 <= sq % 8 + d_col * i < 8) for sq in range(64)]
+
+
+# (row, col) tuples for the mailbox GameState, indexed by r * 8 + c. Pawn squares hold where an enemy pawn has to
+# stand to attack the square, keyed by the side being attacked; rays run outward in MAILBOX_DIRECTIONS order,
+# orthogonal first, which is what attacks_along expects
+MAILBOX_DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+KNIGHT_SQUARES = build_leaper_squares(((-2, -1), (-2, 1), (2, -1), (2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2)))
+KING_SQUARES = build_leaper_squares(MAILBOX_DIRECTIONS)
+PAWN_SQUARES = {"w": build_leaper_squares(((-1, -1), (-1, 1))), "b": build_leaper_squares(((1, -1), (1, 1)))}
+RAY_SQUARES = [tuple(rays) for rays in zip(*(build_ray_squares(d_row, d_col) for d_row, d_col in MAILBOX_DIRECTIONS))]
+
+KNIGHT_ATTACKS = build_leaper_table(((-2, -1), (-2, 1), (2, -1), (2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2)))
+KING_ATTACKS = build_leaper_table(((1, 1), (-1, 1), (1, -1), (-1, -1), (0, 1), (0, -1), (1, 0), (-1, 0)))
+PAWN_ATTACKS = {"w": build_leaper_table(((-1, -1), (-1, 1))), "b": build_leaper_table(((1, -1), (1, 1)))}
+# square indices grow with row and column, so a ray's nearest blocker is its lowest bit when the step is positive
+ROOK_DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1))
+BISHOP_DIRECTIONS = ((-1, -1), (1, -1), (-1, 1), (1, 1))
+RAYS = {d: build_ray_table(d[0], d[1]) for d in ROOK_DIRECTIONS + BISHOP_DIRECTIONS}
+FULL_BOARD = (1 << 64) - 1
+
+
+def ray_attacks(d, sq, occupied):
+    ray = RAYS[d][sq]
+    blockers = ray & occupied
+    if blockers == 0:
+        return ray
+    if d[0] * 8 + d[1] > 0:
+        blocker = (blockers & -blockers).bit_length() - 1
+    else:
+        blocker = blockers.bit_length() - 1
+    return ray ^ RAYS[d][blocker]
+
+
+def sliding_attacks(sq, occupied, directions):
+    attacks = 0
+    for d in directions:
+        attacks |= ray_attacks(d, sq, occupied)
+    return attacks
+
+
+def build_blocker_masks(directions):
+    # the squares whose occupancy can change a slider's attacks: its rays without the board-edge square at their end
+    masks = []
+    for sq in range(64):
+        mask = 0
+        for d in directions:
+            ray = RAYS[d][sq]
+            if ray:
+                mask |= ray ^ (ray & -ray if d[0] * 8 + d[1] < 0 else 1 << (ray.bit_length() - 1))
+        masks.append(mask)
+    return masks
+
+
+# attack sets memoised by square and relevant occupancy, filled in as positions are met rather than all up front
+ROOK_MASKS = build_blocker_masks(ROOK_DIRECTIONS)
+BISHOP_MASKS = build_blocker_masks(BISHOP_DIRECTIONS)
+ROOK_TABLES = [{} for sq in range(64)]
+BISHOP_TABLES = [{} for sq in range(64)]
+SQUARE_COORDS = [divmod(sq, 8) for sq in range(64)]
+
+
+def rook_attacks(sq, occupied):
+    key = occupied & ROOK_MASKS[sq]
+    attacks = ROOK_TABLES[sq].get(key)
+    if attacks is None:
+        attacks = ROOK_TABLES[sq][key] = sliding_attacks(sq, key, ROOK_DIRECTIONS)
+    return attacks
+
+
+def bishop_attacks(sq, occupied):
+    key = occupied & BISHOP_MASKS[sq]
+    attacks = BISHOP_TABLES[sq].get(key)
+    if attacks is None:
+        attacks = BISHOP_TABLES[sq][key] = sliding_attacks(sq, key, BISHOP_DIRECTIONS)
+    return attacks
+
+
+class BitboardGameState(GameState):
+    def __init__(self):
+        GameState.__init__(self)
+        self.load_bitboards()
+
+    def load_bitboards(self):
+        self.bitboards = {piece: 0 for piece in zobristPieces}
+        self.occupancy = {"w": 0, "b": 0}
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece != "--":
+                    self.toggle_piece(piece, r * 8 + c)
+
+    def toggle_piece(self, piece, sq):
+        bit = 1 << sq
+        self.bitboards[piece] ^= bit
+        self.occupancy[piece[0]] ^= bit
+
+    def toggle_move(self, move):
+        # every update is an xor, so applying it twice undoes it
+        bitboards = self.bitboards
+        occupancy = self.occupancy
+        piece = move.piece_move
+        colour = piece[0]
+        start = 1 << (move.start_row * 8 + move.start_col)
+        end = 1 << (move.end_row * 8 + move.end_col)
+        if move.is_pawn_promotion:
+            bitboards[piece] ^= start
+            bitboards[colour + "Q"] ^= end
+        else:
+            bitboards[piece] ^= start | end
+        occupancy[colour] ^= start | end
+        captured = move.piece_captured
+        if captured != "--":
+            bit = 1 << (move.start_row * 8 + move.end_col) if move.is_enpassent else end
+            bitboards[captured] ^= bit
+            occupancy[captured[0]] ^= bit
+        if move.is_castle:
+            row = move.end_row * 8
+            if move.end_col - move.start_col == 2:
+                rook = 1 << (row + move.end_col + 1) | 1 << (row + move.end_col - 1)
+            else:
+                rook = 1 << (row + move.end_col - 2) | 1 << (row + move.end_col + 1)
+            bitboards[colour + "R"] ^= rook
+            occupancy[colour] ^= rook
+
+    def set_fen(self, fen):
+        GameState.set_fen(self, fen)
+        self.load_bitboards()
+
+    def make_move(self, move):
+        GameState.make_move(self, move)
+        self.toggle_move(move)
+
+    def undo_move(self):
+        if len(self.moveLog) != 0:
+            if self.moveLog[-1] is not None:
+                self.toggle_move(self.moveLog[-1])
+            GameState.undo_move(self)
+
+    def is_attacked(self, sq, colour, occupied):
+        bb = self.bitboards
+        if KNIGHT_ATTACKS[sq] & bb[colour + "N"]:
+            return True
+        if PAWN_ATTACKS["b" if colour == "w" else "w"][sq] & bb[colour + "p"]:
+            return True
+        if KING_ATTACKS[sq] & bb[colour + "K"]:
+            return True
+        rooks = bb[colour + "R"] | bb[colour + "Q"]
+        if rooks and rook_attacks(sq, occupied) & rooks:
+            return True
+        bishops = bb[colour + "B"] | bb[colour + "Q"]
+        if bishops and bishop_attacks(sq, occupied) & bishops:
+            return True
+        return False
+
+    def attackers_to(self, sq, colour, occupied):
+        bb = self.bitboards
+        attackers = KNIGHT_ATTACKS[sq] & bb[colour + "N"]
+        attackers |= PAWN_ATTACKS["b" if colour == "w" else "w"][sq] & bb[colour + "p"]
+        attackers |= KING_ATTACKS[sq] & bb[colour + "K"]
+        attackers |= rook_attacks(sq, occupied) & (bb[colour + "R"] | bb[colour + "Q"])
+        attackers |= bishop_attacks(sq, occupied) & (bb[colour + "B"] | bb[colour + "Q"])
+        return attackers
+
+    def sq_under_attack(self, r, c):
+        enemy_colour = "b" if self.whiteToMove else "w"
+        return self.is_attacked(r * 8 + c, enemy_colour, self.occupancy["w"] | self.occupancy["b"])
+
+    def get_legal_moves(self):
+        ally_colour = "w" if self.whiteToMove else "b"
+        enemy_colour = "b" if self.whiteToMove else "w"
+        bb = self.bitboards
+        own = self.occupancy[ally_colour]
+        enemy = self.occupancy[enemy_colour]
+        occupied = own | enemy
+        king_sq = bb[ally_colour + "K"].bit_length() - 1
+        king_row, king_col = divmod(king_sq, 8)
+
+        checkers = self.attackers_to(king_sq, enemy_colour, occupied)
+        self.inCheck = checkers != 0
+        moves = []
+
+        # double check: only the king can move
+        if checkers & (checkers - 1) == 0:
+            if checkers:
+                checker_sq = checkers.bit_length() - 1
+                check_mask = checkers
+                for d in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+                    if RAYS[d][king_sq] & checkers:
+                        check_mask = RAYS[d][king_sq] ^ RAYS[d][checker_sq]
+                        break
+            else:
+                check_mask = FULL_BOARD
+
+            pin_masks = {}
+            rook_pinners = bb[enemy_colour + "Q"] | bb[enemy_colour + "R"]
+            bishop_pinners = bb[enemy_colour + "Q"] | bb[enemy_colour + "B"]
+            for d in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+                pinners = rook_pinners if d in ROOK_DIRECTIONS else bishop_pinners
+                # no enemy slider anywhere on the ray means nothing on it can be pinned
+                if RAYS[d][king_sq] & pinners == 0:
+                    continue
+                first = ray_attacks(d, king_sq, occupied) & own
+                if first == 0:
+                    continue
+                pinned_sq = first.bit_length() - 1
+                beyond = ray_attacks(d, pinned_sq, occupied) & pinners
+                if beyond:
+                    pin_masks[pinned_sq] = RAYS[d][king_sq] ^ RAYS[d][beyond.bit_length() - 1]
+
+            self.get_bitboard_piece_moves(ally_colour, own, enemy, occupied, check_mask, pin_masks, moves)
+            if not checkers:
+                self.get_castle_moves(king_row, king_col, moves)
+
+        king_targets = KING_ATTACKS[king_sq] & ~own
+        occupied_without_king = occupied ^ (1 << king_sq)
+        while king_targets:
+            lsb = king_targets & -king_targets
+            king_targets ^= lsb
+            sq = lsb.bit_length() - 1
+            if not self.is_attacked(sq, enemy_colour, occupied_without_king):
+                moves.append(Move((king_row, king_col), divmod(sq, 8), self.board))
+        return moves
+
+    def get_bitboard_piece_moves(self, colour, own, enemy, occupied, check_mask, pin_masks, moves):
+        bb = self.bitboards
+        for piece in ("N", "B", "R", "Q"):
+            pieces = bb[colour + piece]
+            while pieces:
+                lsb = pieces & -pieces
+                pieces ^= lsb
+                sq = lsb.bit_length() - 1
+                if piece == "N":
+                    targets = KNIGHT_ATTACKS[sq]
+                elif piece == "B":
+                    targets = bishop_attacks(sq, occupied)
+                elif piece == "R":
+                    targets = rook_attacks(sq, occupied)
+                else:
+                    targets = rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+                targets &= ~own & check_mask
+                if sq in pin_masks:
+                    targets &= pin_masks[sq]
+                self.add_bitboard_moves(sq, targets, moves)
+
+        if colour == "w":
+            step = -8
+            start_rank = 0x00FF000000000000
+        else:
+            step = 8
+            start_rank = 0x000000000000FF00
+        pawns = bb[colour + "p"]
+        while pawns:
+            lsb = pawns & -pawns
+            pawns ^= lsb
+            sq = lsb.bit_length() - 1
+            targets = PAWN_ATTACKS[colour][sq] & enemy
+            push = 1 << (sq + step)
+            if push & occupied == 0:
+                targets |= push
+                if lsb & start_rank and (1 << (sq + 2 * step)) & occupied == 0:
+                    targets |= 1 << (sq + 2 * step)
+            targets &= check_mask
+            if sq in pin_masks:
+                targets &= pin_masks[sq]
+            self.add_bitboard_moves(sq, targets, moves)
+
+            if self.enpassentPossible != ():
+                ep_sq = self.enpassentPossible[0] * 8 + self.enpassentPossible[1]
+                if PAWN_ATTACKS[colour][sq] & (1 << ep_sq):
+                    move = Move(divmod(sq, 8), self.enpassentPossible, self.board, isEnpassentMove=True)
+                    if self.enpassent_is_legal(move):
+                        moves.append(move)
+
+    def add_bitboard_moves(self, sq, targets, moves):
+        start = SQUARE_COORDS[sq]
+        board = self.board
+        while targets:
+            lsb = targets & -targets
+            targets ^= lsb
+            moves.append(Move(start, SQUARE_COORDS[lsb.bit_length() - 1], board))
+
+
+class CastleRights:
+    __slots__ = ("wks", "bks", "wqs", "bqs")
+
+    def __init__(self, wks, bks, wqs, bqs):
+        self.wks = wks
+        self.bks = bks
+        self.wqs = wqs
+        self.bqs = bqs
+
+    def pack(self):
+        # the undo log keeps rights as four bits so making a move does not allocate a CastleRights
+        return self.wks | self.bks << 1 | self.wqs << 2 | self.bqs << 3
+
+    def unpack(self, bits):
+        self.wks = bits & 1 == 1
+        self.bks = bits & 2 == 2
+        self.wqs = bits & 4 == 4
+        self.bqs = bits & 8 == 8
+
+class Move:
+    __slots__ = ("start_row", "start_col", "end_row", "end_col", "piece_move", "piece_captured",
+                 "is_pawn_promotion", "is_enpassent", "is_castle", "move_ID")
+    ranks_to_rows = {"1": 7, "2": 6, "3": 5, "4": 4, "5": 3, "6": 2, "7": 1, "8": 0}
+    rows_to_ranks = {v: k for k, v in ranks_to_rows.items()}
+    files_to_col = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4, "f": 5, "g": 6, "h": 7}
+    col_to_files = {v: k for k, v in files_to_col.items()}
+
+    def __init__(self, start_sq, end_sq, board, isEnpassentMove=False, isCastleMove=False):
+        self.start_row = start_sq[0]
+        self.start_col = start_sq[1]
+        self.end_row = end_sq[0]
+        self.end_col = end_sq[1]
+        self.piece_move = board[self.start_row][self.start_col]
+        self.piece_captured = board[self.end_row][self.end_col]
+        self.is_pawn_promotion = False
+        self.is_enpassent = isEnpassentMove
+        self.is_castle = isCastleMove
+
+        if self.is_enpassent:
+            self.piece_captured = "wp" if self.piece_move == "bp" else "bp"
+
+        if (self.piece_move == "wp" and self.end_row == 0) or (self.piece_move == "bp" and self.end_row == 7):
+            self.is_pawn_promotion = True
+
+        self.move_ID = self.start_row * 1000 + self.start_col * 100 + self.end_row * 10 + self.end_col
+
+    def __eq__(self, other):
+        if isinstance(other, Move):
+            return self.move_ID == other.move_ID
+        return False
+
+    def get_chess_notation(self, gs):
+        if self.piece_captured != "--":
+            takes = "x"
+        else:
+            takes = ""
+
+        piece = self.piece_move[1]
+
+        if piece == "p":
+            if takes == "x":
+                piece = self.col_to_files[self.start_col]
+            else:
+                piece = ""
+
+        location = self.get_rank_file(self.end_row, self.end_col)
+
+        move = piece + takes + location
+
+        if move == "Kg1":
+            move = "0-0"
+        if move == "Kc1":
+            move = "0-0-0"
+
+        if gs.in_check():
+            if gs.checkmate:
+                move += "#"
+            else:
+                move += "+"
+
+        return move
+
+
+    def get_rank_file(self, r, c):
+        return self.col_to_files[c] + self.rows_to_ranks[r]
+
+
+def coordinates(move):
+    # the move as from-square and to-square, e.g. "e2e4"; None for no move
+    if move is None:
+        return None
+    return move.get_rank_file(move.start_row, move.start_col) + move.get_rank_file(move.end_row, move.end_col)
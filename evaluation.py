@@ -0,0 +1,41 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from chessEngine import materialValues, pieceSquareTables
+
+# int8 square codes: 0 is empty, 1-6 white pawn to king, 7-12 black pawn to king
+PIECES = ("--", "wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK")
+PIECE_CODES = {piece: code for code, piece in enumerate(PIECES)}
+FEN_CODES = {"P": 1, "N": 2, "B": 3, "R": 4, "Q": 5, "K": 6, "p": 7, "n": 8, "b": 9, "r": 10, "q": 11, "k": 12}
+
+# row per piece code so a whole batch is scored with one gather; these are the same terms make_move keeps
+# incrementally in materialScore and positionScore
+SQUARE_SCORES = [[0.0] * 64] + [[materialValues[piece] + pieceSquareTables[piece][sq // 8][sq % 8] for sq in range(64)]
+                                for piece in PIECES[1:]]
+if np is not None:
+    SQUARE_SCORES_ARRAY = np.array(SQUARE_SCORES, dtype=np.float64)
+
+
+def encode_board(board):
+    return bytes(PIECE_CODES[piece] for row in board for piece in row)
+
+
+def encode_fen(fen):
+    squares = bytearray()
+    for letter in fen.split(None, 1)[0]:
+        if letter.isdigit():
+            squares.extend(bytes(int(letter)))
+        elif letter != "/":
+            squares.append(FEN_CODES[letter])
+    return bytes(squares)
+
+
+def evaluate_batch(encoded):
+    # encoded is a sequence of 64-byte boards from encode_board or encode_fen; returns material plus
+    # piece-square scores from white's side, one per board
+    if np is None:
+        return [sum(SQUARE_SCORES[code][sq] for sq, code in enumerate(board) if code) for board in encoded]
+    boards = np.frombuffer(b"".join(encoded), dtype=np.int8).reshape(-1, 64)
+    return SQUARE_SCORES_ARRAY[boards, np.arange(64)].sum(axis=1).tolist()
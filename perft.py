@@ -0,0 +1,101 @@
+import argparse
+import sys
+import time
+
+from chessEngine import GameState, BitboardGameState
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# Standard perft positions with their published leaf counts. The engine only ever promotes to a queen,
+# so each position is listed only to depths where no promotion is reachable.
+PERFT_POSITIONS = [
+    ("start", STARTING_FEN, {1: 20, 2: 400, 3: 8902, 4: 197281}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862}),
+    ("endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ("middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890}),
+]
+
+BACKENDS = {"mailbox": GameState, "bitboard": BitboardGameState}
+
+
+def perft(gs, depth):
+    moves = gs.get_valid_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        gs.make_move(move)
+        nodes += perft(gs, depth - 1)
+        gs.undo_move()
+    return nodes
+
+
+def divide(gs, depth):
+    counts = []
+    for move in gs.get_valid_moves():
+        gs.make_move(move)
+        nodes = perft(gs, depth - 1) if depth > 1 else 1
+        gs.undo_move()
+        counts.append((move.get_rank_file(move.start_row, move.start_col) +
+                       move.get_rank_file(move.end_row, move.end_col), nodes))
+    return counts
+
+
+def loadPosition(fen, backend="bitboard"):
+    gs = BACKENDS[backend]()
+    gs.set_fen(fen)
+    return gs
+
+
+def runPerftSuite(maxDepth=3, backend="bitboard", out=sys.stdout):
+    # returns True when every count matches
+    passed = True
+    totalNodes = 0
+    totalTime = 0
+    for name, fen, expected in PERFT_POSITIONS:
+        gs = loadPosition(fen, backend)
+        for depth in sorted(expected):
+            if depth > maxDepth:
+                break
+            start = time.perf_counter()
+            nodes = perft(gs, depth)
+            elapsed = time.perf_counter() - start
+            totalNodes += nodes
+            totalTime += elapsed
+            ok = nodes == expected[depth]
+            passed = passed and ok
+            out.write("%-10s depth %d  %10d  %s  %.2fs  %d nps\n" % (name, depth, nodes, "ok" if ok else
+                                                                      "FAIL (expected %d)" % expected[depth],
+                                                                      elapsed, nodes / elapsed if elapsed else 0))
+    out.write("total %d nodes in %.2fs, %d nps\n" % (totalNodes, totalTime, totalNodes / totalTime if totalTime else 0))
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count move-generator leaf nodes and measure throughput.")
+    parser.add_argument("--fen", help="position to count from; runs the standard suite when omitted")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--divide", action="store_true", help="print the count below each root move")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="bitboard")
+    args = parser.parse_args()
+
+    if args.fen is None:
+        sys.exit(0 if runPerftSuite(args.depth, args.backend) else 1)
+
+    gs = loadPosition(args.fen, args.backend)
+    start = time.perf_counter()
+    if args.divide:
+        counts = divide(gs, args.depth)
+        for move, nodes in sorted(counts):
+            print("%s: %d" % (move, nodes))
+        nodes = sum(nodes for move, nodes in counts)
+    else:
+        nodes = perft(gs, args.depth)
+    elapsed = time.perf_counter() - start
+    print("nodes %d  time %.2fs  nps %d" % (nodes, elapsed, nodes / elapsed if elapsed else 0))
+
+
+if __name__ == "__main__":
+    main()
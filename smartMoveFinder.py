@@ -1,13 +1,138 @@
+import copy
+import json
+import math
+import multiprocessing
+import os
 import random
+import threading
+import struct
+import time
+import mmap
+from concurrent.futures import ProcessPoolExecutor, wait
+from array import array
+from bisect import bisect_left
+
+from tablebase import Tablebase, TABLEBASE_PATH
 
 
 pieceScores = {"K": 0, "Q": 9, "R": 5, "B": 3, "N": 3, "p": 1}
 CHECKMATE = 1000
 STALEMATE = 0
 DEPTH = 3
+MAX_DEPTH = 64
+TIME_LIMIT = 2.0
 inBook = True
 nextMove = None
-
+TT_SIZE_MB = 16
+OPENING_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Opening_book.txt")
+openingBook = None
+USE_TABLEBASE = True
+tablebase = None
+tablebaseLoaded = False
+# what the running search probes: loadTablebase()'s answer when it started, so USE_TABLEBASE is honoured in the tree
+searchTablebase = None
+# tablebase wins score below a real mate found by search but above any material balance
+TABLEBASE_WIN = CHECKMATE / 2
+DELTA_MARGIN = 2
+# selective search; switch off to compare against the full-width search
+NULL_MOVE_PRUNING = True
+NULL_MOVE_REDUCTION = 2
+LATE_MOVE_REDUCTIONS = True
+LMR_MIN_DEPTH = 3
+LMR_FULL_DEPTH_MOVES = 3
+PRINCIPAL_VARIATION_SEARCH = True
+ASPIRATION_WINDOWS = True
+ASPIRATION_WINDOW = 1.5  # one pawn either side of the previous iteration's score
+# scores are floats, so a "null" window is this wide rather than one unit
+NULL_WINDOW = 0.001
+
+searchDepth = DEPTH
+searchDeadline = None  # a SearchDeadline once a search has started
+searchNodeLimit = None
+nodesSearched = 0
+stopSearch = False
+searchStopEvent = None
+completedDepth = 0
+searchScore = 0
+
+# per-search counters and phase timings; searchStats is None unless enableSearchStats has been called
+STATS_COUNTERS = ("quiescenceNodes", "evaluations", "betaCutoffs", "firstMoveCutoffs", "ttProbes", "ttHits",
+                  "ttCutoffs", "tablebaseHits", "nullMoveCutoffs", "reSearches", "aspirationReSearches")
+STATS_PHASES = ("moveGeneration", "makeMove", "undoMove", "evaluation")
+statsEnabled = False
+statsCallback = None
+statsLogPath = None
+searchStats = None
+
+SEARCH_WORKERS = 1
+workerPool = None
+workerPoolSize = 0
+# handed to every worker process when the pool starts: a stop flag the parent raises on cancel, and a queue the
+# workers report each completed iteration on
+workerStopEvent = None
+workerProgress = None
+workerDeadline = None
+WORKER_POLL_SECONDS = 0.02
+# forked workers can inherit a lock another thread holds at the time (uci.py's stdin reader), so they start from a
+# clean interpreter instead and are sent the search switches with every job
+WORKER_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+WORKER_SETTINGS = ("NULL_MOVE_PRUNING", "NULL_MOVE_REDUCTION", "LATE_MOVE_REDUCTIONS", "LMR_MIN_DEPTH",
+                   "LMR_FULL_DEPTH_MOVES", "PRINCIPAL_VARIATION_SEARCH", "ASPIRATION_WINDOWS", "ASPIRATION_WINDOW",
+                   "DELTA_MARGIN", "USE_TABLEBASE", "statsEnabled")
+
+EXACT = 0
+LOWERBOUND = 1
+UPPERBOUND = 2
+
+orderValues = {"K": 10, "Q": 9, "R": 5, "B": 3, "N": 3, "p": 1}
+killerMoves = [[-1, -1] for i in range(MAX_DEPTH + 1)]
+historyScores = {}
+
+
+class TranspositionTable:
+    # key, depth, score, bound, move_ID and age packed into parallel typed arrays
+    ENTRY_BYTES = 8 + 1 + 8 + 1 + 4 + 1
+
+    def __init__(self, sizeMB=TT_SIZE_MB):
+        entries = 1
+        while entries * 2 * self.ENTRY_BYTES <= sizeMB * 1024 * 1024:
+            entries *= 2
+        self.sizeMB = sizeMB
+        self.size = entries
+        self.mask = entries - 1
+        self.age = 0
+        self.keys = array("Q", bytes(8 * entries))
+        self.depths = array("b", bytes(entries))
+        self.scores = array("d", bytes(8 * entries))
+        self.bounds = array("B", bytes(entries))
+        self.moves = array("i", bytes(4 * entries))
+        self.ages = array("B", bytes(entries))
+
+    def new_search(self):
+        self.age = (self.age + 1) & 0xFF
+
+    def clear(self):
+        self.__init__(self.sizeMB)
+
+    def probe(self, key):
+        i = key & self.mask
+        if self.keys[i] != key or self.depths[i] == 0:
+            return None
+        return self.depths[i] - 1, self.scores[i], self.bounds[i], self.moves[i]
+
+    def store(self, key, depth, score, bound, move):
+        i = key & self.mask
+        if self.keys[i] != key and self.ages[i] == self.age and self.depths[i] > depth + 1:
+            return
+        self.keys[i] = key
+        self.depths[i] = depth + 1
+        self.scores[i] = score
+        self.bounds[i] = bound
+        self.moves[i] = move.move_ID if move is not None else -1
+        self.ages[i] = self.age
+
+
+transpositionTable = TranspositionTable()
 
 
 
@@ -17,17 +142,382 @@ def findRandomMove(validMoves):
     return validMoves[i]
 
 
-def findBestMove(gs, validMoves):
-    global nextMove
+class SearchAborted(Exception):
+    pass
+
+
+class SearchDeadline:
+    # when the search has to stop, on the time.perf_counter() clock; held by whoever started the search so the
+    # budget can change while it runs. math.inf means no clock
+    def __init__(self, value=math.inf):
+        self.value = value
+
+
+def startClock(deadline, timeLimit, startTime):
+    # a deadline already set by the caller (a ponder hit that arrived before the search got here) is kept
+    if deadline is None:
+        deadline = SearchDeadline()
+    if timeLimit is not None and deadline.value == math.inf:
+        deadline.value = startTime + timeLimit
+    return deadline
+
+
+def findBestMove(gs, validMoves, maxDepth=None, timeLimit=None, nodeLimit=None, workers=None, onIteration=None,
+                 stopEvent=None, deadline=None):
+    # with no limit given at all the search gets TIME_LIMIT seconds, read here so changing it at runtime takes effect
+    global nextMove, searchScore, completedDepth, nodesSearched
+    if maxDepth is None and timeLimit is None and nodeLimit is None:
+        timeLimit = TIME_LIMIT
     if inBook:
-        nextMove = checkOpeningBook(gs, gs.moveList, validMoves)
+        nextMove = checkOpeningBook(gs, validMoves)
+        if nextMove is not None:
+            searchScore, completedDepth, nodesSearched = 0, 0, 0
+            reportUnsearchedMove(nextMove, "book")
+            return nextMove
+
+    if not inBook and loadTablebase() is not None:
+        nextMove = tablebaseMove(gs, validMoves)
+        if nextMove is not None:
+            reportUnsearchedMove(nextMove, "tablebase")
+            return nextMove
 
     if not inBook:
-        nextMove = None
-        findMoveNegaMaxAlphaBeta(gs, validMoves, DEPTH, -CHECKMATE, CHECKMATE, 1 if gs.whiteToMove else -1)
+        if maxDepth is None:
+            maxDepth = MAX_DEPTH
+        if workers is None:
+            workers = SEARCH_WORKERS
+        if workers > 1 and len(validMoves) > 1:
+            nextMove = parallelSearch(gs, validMoves, workers, maxDepth, timeLimit, nodeLimit, onIteration, stopEvent,
+                                      deadline)
+        else:
+            nextMove = iterativeDeepening(gs, validMoves, maxDepth, timeLimit, nodeLimit, onIteration, stopEvent,
+                                          deadline)
     return nextMove
 
 
+class BackgroundSearch:
+    # runs findBestMove in a daemon thread on a private copy of the position, so the caller's
+    # GameState stays free to change; cancel() stops the search and waits for the thread
+    def __init__(self, gs, onIteration=None, onFinished=None, **searchOptions):
+        self.gs = copy.deepcopy(gs)
+        self.searchOptions = searchOptions
+        self.userOnIteration = onIteration
+        self.onFinished = onFinished
+        self.stopEvent = threading.Event()
+        self.deadline = SearchDeadline()
+        self.depth = 0
+        self.score = 0
+        self.nodes = 0
+        self.bestMove = None
+        self.result = None
+        self.done = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        try:
+            self.result = findBestMove(self.gs, self.gs.get_valid_moves(), onIteration=self.onIteration,
+                                       stopEvent=self.stopEvent, deadline=self.deadline, **self.searchOptions)
+        finally:
+            self.done = True
+        if self.onFinished is not None:
+            self.onFinished(self)
+
+    def onIteration(self, depth, score, move, nodes, seconds):
+        self.depth = depth
+        self.score = score
+        self.nodes = nodes
+        self.bestMove = move
+        if self.userOnIteration is not None:
+            self.userOnIteration(depth, score, move, nodes, seconds)
+
+    def setTimeLimit(self, timeLimit):
+        # gives a search started without a clock (a ponder search) timeLimit more seconds from now; safe to call
+        # before the search thread has got going
+        self.deadline.value = time.perf_counter() + timeLimit if timeLimit is not None else math.inf
+
+    def cancel(self):
+        self.stopEvent.set()
+        self.thread.join()
+
+
+def getWorkerPool(workers):
+    global workerPool, workerPoolSize, workerStopEvent, workerProgress, workerDeadline
+    if workerPool is None or workerPoolSize != workers:
+        if workerPool is not None:
+            workerPool.shutdown(cancel_futures=True)
+        context = multiprocessing.get_context(WORKER_START_METHOD)
+        workerStopEvent = context.Event()
+        workerProgress = context.SimpleQueue()
+        workerDeadline = context.Value("d", math.inf, lock=False)
+        workerPool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=initSearchWorker,
+                                         initargs=(workerStopEvent, workerProgress, workerDeadline))
+        workerPoolSize = workers
+    return workerPool
+
+
+def initSearchWorker(stopEvent, progress, deadline):
+    global workerStopEvent, workerProgress, workerDeadline
+    workerStopEvent = stopEvent
+    workerProgress = progress
+    workerDeadline = deadline
+
+
+def parallelSearch(gs, validMoves, workers, maxDepth, timeLimit=None, nodeLimit=None, onIteration=None,
+                   stopEvent=None, deadline=None):
+    # root splitting: each worker process searches a share of the root moves on its own copy of gs. The parent
+    # waits in short polls so it can pass a cancel or a new deadline on to the workers and report depths as they
+    # all complete them
+    global nodesSearched, completedDepth, searchScore, stopSearch, searchStats
+    ttEntry = transpositionTable.probe(gs.zobristKey)
+    rootMoves = orderedMoves(validMoves, ttEntry[3] if ttEntry is not None else -1)
+    workers = min(workers, len(rootMoves))
+    shares = [[move.move_ID for move in rootMoves[i::workers]] for i in range(workers)]
+    workerNodeLimit = nodeLimit // workers if nodeLimit is not None else None
+
+    pool = getWorkerPool(workers)
+    workerStopEvent.clear()
+    stopSearch = False
+    startTime = time.perf_counter()
+    deadline = startClock(deadline, timeLimit, startTime)
+    workerDeadline.value = deadline.value
+    settings = {name: globals()[name] for name in WORKER_SETTINGS}
+    futures = [pool.submit(searchRootMoves, gs, share, maxDepth, workerNodeLimit, i, settings)
+               for i, share in enumerate(shares)]
+    # workers stop at different depths under a clock, and scores from different depths do not compare, so the
+    # move is picked at the deepest depth every worker finished
+    iterations = [[] for i in range(workers)]
+    nodes = [0] * workers
+    completedDepth = 0
+    bestMove = None
+    pending = futures
+    while True:
+        done, pending = wait(pending, timeout=WORKER_POLL_SECONDS)
+        if stopSearch or (stopEvent is not None and stopEvent.is_set()):
+            workerStopEvent.set()
+        workerDeadline.value = deadline.value
+        # a finished worker's reports are all in the queue before its result is
+        while not workerProgress.empty():
+            worker, score, moveID, workerNodes = workerProgress.get()
+            iterations[worker].append((score, moveID))
+            nodes[worker] = workerNodes
+        while all(len(workerIterations) > completedDepth for workerIterations in iterations):
+            completedDepth += 1
+            searchScore, bestMoveID = max(workerIterations[completedDepth - 1] for workerIterations in iterations)
+            for move in validMoves:
+                if move.move_ID == bestMoveID:
+                    bestMove = move
+            if onIteration is not None:
+                onIteration(completedDepth, searchScore, bestMove, sum(nodes), time.perf_counter() - startTime)
+        if not pending:
+            break
+
+    results = [future.result() for future in futures]
+    nodesSearched = sum(workerNodes for workerNodes, workerStats in results)
+    if statsEnabled:
+        # one line per move: the workers' counters and phase timings are added up, so the timings can come to more
+        # than the wall-clock time the move took
+        searchStats = {name: sum(workerStats[name] for workerNodes, workerStats in results)
+                       for name in STATS_COUNTERS + STATS_PHASES}
+        reportSearchStats(bestMove, time.perf_counter() - startTime)
+    return bestMove
+
+
+def searchRootMoves(gs, moveIDs, maxDepth, nodeLimit, worker, settings):
+    globals().update(settings)
+    rootMoves = [move for move in gs.get_valid_moves() if move.move_ID in moveIDs]
+
+    def onIteration(depth, score, move, nodes, seconds):
+        workerProgress.put((worker, score, move.move_ID, nodes))
+    iterativeDeepening(gs, rootMoves, maxDepth, None, nodeLimit, onIteration, workerStopEvent, workerDeadline)
+    return nodesSearched, searchStats
+
+
+def iterativeDeepening(gs, validMoves, maxDepth, timeLimit=None, nodeLimit=None, onIteration=None, stopEvent=None,
+                       deadline=None):
+    # onIteration(depth, score, move, nodes, seconds) is called after every completed iteration
+    global nextMove, searchDepth, searchDeadline, searchNodeLimit, nodesSearched, stopSearch, searchStopEvent
+    global completedDepth, searchScore, searchStats, searchTablebase
+    searchTablebase = loadTablebase()
+    searchStats = dict.fromkeys(STATS_COUNTERS + STATS_PHASES, 0) if statsEnabled else None
+    restorePhases = instrumentPhases(gs) if statsEnabled else None
+    transpositionTable.new_search()
+    clearMoveOrdering()
+    startTime = time.perf_counter()
+    searchDeadline = startClock(deadline, timeLimit, startTime)
+    searchNodeLimit = nodeLimit
+    nodesSearched = 0
+    stopSearch = False
+    searchStopEvent = stopEvent
+    rootPly = len(gs.moveLog)
+    rootMoves = list(validMoves)
+    bestMove = None
+    completedDepth = 0
+
+    try:
+        score = None
+        for depth in range(1, maxDepth + 1):
+            searchDepth = depth
+            # aspiration: search a narrow window around the last score, widening it on whichever side it fails
+            window = ASPIRATION_WINDOW
+            if ASPIRATION_WINDOWS and score is not None and abs(score) < CHECKMATE:
+                alpha, beta = max(score - window, -CHECKMATE), min(score + window, CHECKMATE)
+            else:
+                alpha, beta = -CHECKMATE, CHECKMATE
+            try:
+                while True:
+                    nextMove = None
+                    score = findMoveNegaMaxAlphaBeta(gs, rootMoves, depth, alpha, beta, 1 if gs.whiteToMove else -1)
+                    if score <= alpha and alpha > -CHECKMATE:
+                        window *= 2
+                        alpha = max(score - window, -CHECKMATE)
+                    elif score >= beta and beta < CHECKMATE:
+                        window *= 2
+                        beta = min(score + window, CHECKMATE)
+                    else:
+                        break
+                    if searchStats is not None:
+                        searchStats["aspirationReSearches"] += 1
+            except SearchAborted:
+                while len(gs.moveLog) > rootPly:
+                    gs.undo_move()
+                break
+            if nextMove is None:
+                break
+            bestMove = nextMove
+            completedDepth = depth
+            searchScore = score
+            if onIteration is not None:
+                onIteration(depth, score, bestMove, nodesSearched, time.perf_counter() - startTime)
+            # the previous iteration's best move is searched first at the next depth
+            rootMoves.remove(bestMove)
+            rootMoves.insert(0, bestMove)
+            if score >= CHECKMATE:
+                break
+    finally:
+        if restorePhases is not None:
+            restorePhases()
+    if searchStats is not None:
+        reportSearchStats(bestMove, time.perf_counter() - startTime)
+    return bestMove
+
+
+def enableSearchStats(onStats=None, logPath=None):
+    # after every search onStats(stats) is called with a dict of counters and phase timings, and logPath (if given)
+    # gets the same dict appended as one JSON line
+    global statsEnabled, statsCallback, statsLogPath
+    statsEnabled = True
+    statsCallback = onStats
+    statsLogPath = logPath
+
+
+def disableSearchStats():
+    global statsEnabled, statsCallback, statsLogPath, searchStats
+    statsEnabled = False
+    statsCallback = None
+    statsLogPath = None
+    searchStats = None
+
+
+def instrumentPhases(gs):
+    # wraps the position's hot methods and scoreMaterial in timers for this search only, so nothing is timed
+    # while stats are off; returns the function that puts the originals back
+    global scoreMaterial
+    untimedScoreMaterial = scoreMaterial
+
+    def timed(function, phase, counter=None):
+        def timedFunction(*args):
+            start = time.perf_counter()
+            result = function(*args)
+            searchStats[phase] += time.perf_counter() - start
+            if counter is not None:
+                searchStats[counter] += 1
+            return result
+        return timedFunction
+
+    gs.get_valid_moves = timed(gs.get_valid_moves, "moveGeneration")
+    gs.make_move = timed(gs.make_move, "makeMove")
+    gs.undo_move = timed(gs.undo_move, "undoMove")
+    gs.make_null_move = timed(gs.make_null_move, "makeMove")
+    scoreMaterial = timed(untimedScoreMaterial, "evaluation", "evaluations")
+
+    def restore():
+        global scoreMaterial
+        for name in ("get_valid_moves", "make_move", "undo_move", "make_null_move"):
+            del gs.__dict__[name]
+        scoreMaterial = untimedScoreMaterial
+    return restore
+
+
+def reportSearchStats(bestMove, seconds, source="search"):
+    # source says where the move came from: "search", or "book" / "tablebase" for a move played without searching
+    stats = searchStats
+    stats.update({"source": source, "depth": completedDepth, "score": searchScore, "nodes": nodesSearched, "seconds": round(seconds, 4),
+                  "nps": round(nodesSearched / seconds) if seconds else 0,
+                  "firstMoveCutoffRate": round(stats["firstMoveCutoffs"] / stats["betaCutoffs"], 4)
+                  if stats["betaCutoffs"] else None,
+                  "move": bestMove.get_rank_file(bestMove.start_row, bestMove.start_col) +
+                  bestMove.get_rank_file(bestMove.end_row, bestMove.end_col) if bestMove is not None else None})
+    for phase in STATS_PHASES:
+        stats[phase] = round(stats[phase], 4)
+    if statsCallback is not None:
+        statsCallback(stats)
+    if statsLogPath is not None:
+        with open(statsLogPath, "a") as logFile:
+            logFile.write(json.dumps(stats) + "\n")
+
+
+def reportUnsearchedMove(move, source):
+    # book and tablebase moves still get their stats line, with every search counter at zero
+    global searchStats
+    if statsEnabled:
+        searchStats = dict.fromkeys(STATS_COUNTERS + STATS_PHASES, 0)
+        reportSearchStats(move, 0, source)
+
+
+def principalVariation(gs, maxLength=MAX_DEPTH):
+    # follows the best moves stored in the transposition table from the current position
+    pv = []
+    seen = set()
+    while len(pv) < maxLength and gs.zobristKey not in seen:
+        seen.add(gs.zobristKey)
+        ttEntry = transpositionTable.probe(gs.zobristKey)
+        if ttEntry is None:
+            break
+        move = None
+        for validMove in gs.get_valid_moves():
+            if validMove.move_ID == ttEntry[3]:
+                move = validMove
+        if move is None:
+            break
+        pv.append(move)
+        gs.make_move(move)
+    for i in range(len(pv)):
+        gs.undo_move()
+    gs.get_valid_moves()
+    return pv
+
+
+def stopSearching():
+    global stopSearch
+    stopSearch = True
+
+
+def checkSearchLimits():
+    if stopSearch or (searchStopEvent is not None and searchStopEvent.is_set()):
+        raise SearchAborted()
+    # the first iteration always completes so there is a move to return
+    if searchDepth == 1:
+        return
+    if searchNodeLimit is not None and nodesSearched >= searchNodeLimit:
+        raise SearchAborted()
+    if nodesSearched & 127 == 0 and time.perf_counter() >= searchDeadline.value:
+        raise SearchAborted()
+
+
 def findMoveMinMax(gs, validMoves, depth, whiteToMove):
     global nextMove
 
@@ -80,34 +570,193 @@ def findMoveNegaMax(gs, validMoves, depth, turnMultiplier):
     return maxScore
 
 
-def findMoveNegaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, turnMultiplier):
-    global nextMove
-    if depth == 0:
-        return turnMultiplier * scoreMaterial(gs.board, gs, validMoves)
+def findMoveNegaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, turnMultiplier, ply=0):
+    global nextMove, nodesSearched
+    nodesSearched += 1
+    checkSearchLimits()
+    # a position repeated once inside the tree is scored as the draw it can be forced into
+    if ply != 0 and (gs.stalemate or gs.repetitions() != 0):
+        return STALEMATE
+    if searchTablebase is not None and ply != 0:
+        entry = searchTablebase.probe(gs)
+        if entry is not None:
+            if searchStats is not None:
+                searchStats["tablebaseHits"] += 1
+            return tablebaseScore(entry)
+    alphaOrig = alpha
+    ttMoveID = -1
+    ttEntry = transpositionTable.probe(gs.zobristKey)
+    if searchStats is not None:
+        searchStats["ttProbes"] += 1
+        searchStats["ttHits"] += ttEntry is not None
+    if ttEntry is not None:
+        ttDepth, ttScore, ttBound, ttMoveID = ttEntry
+        if ply != 0 and ttDepth >= depth:
+            if ttBound == LOWERBOUND:
+                alpha = max(alpha, ttScore)
+            elif ttBound == UPPERBOUND:
+                beta = min(beta, ttScore)
+            if ttBound == EXACT or alpha >= beta:
+                if searchStats is not None:
+                    searchStats["ttCutoffs"] += 1
+                return ttScore
+
+    if depth == 0 or len(validMoves) == 0:
+        return quiescenceSearch(gs, validMoves, alpha, beta, turnMultiplier, ply)
+
+    # below the root the flag is fresh from the caller's get_valid_moves; at the root it is whatever the deepest
+    # node of the last iteration left behind
+    inCheck = gs.in_check() if ply == 0 else gs.inCheck
+    # null move: if passing still fails high the position is good enough to cut. Not tried twice in a row, in
+    # check, or when the side to move has only pawns, where being forced to move is often the losing factor
+    if NULL_MOVE_PRUNING and ply != 0 and depth > NULL_MOVE_REDUCTION and not inCheck and gs.moveLog[-1] is not None \
+            and abs(beta) < CHECKMATE and hasPieces(gs):
+        gs.make_null_move()
+        nextMoves = gs.get_valid_moves()
+        score = -findMoveNegaMaxAlphaBeta(gs, nextMoves, depth - 1 - NULL_MOVE_REDUCTION, -beta, -beta + NULL_WINDOW,
+                                          -turnMultiplier, ply + 1)
+        gs.undo_move()
+        if score >= beta:
+            if searchStats is not None:
+                searchStats["nullMoveCutoffs"] += 1
+            return beta
+
+    validMoves = orderedMoves(validMoves, ttMoveID, ply)
 
     maxScore = -CHECKMATE
-    for move in validMoves:
+    bestMove = None
+    for i, move in enumerate(validMoves):
         gs.make_move(move)
         nextMoves = gs.get_valid_moves()
-        score = -findMoveNegaMaxAlphaBeta(gs, nextMoves, depth - 1, -beta, -alpha, -turnMultiplier)
+        reduction = 0
+        # late quiet moves are searched shallower first, and again at full depth only if they beat alpha
+        if LATE_MOVE_REDUCTIONS and depth >= LMR_MIN_DEPTH and i >= LMR_FULL_DEPTH_MOVES and not inCheck \
+                and not gs.inCheck and move.piece_captured == "--" and not move.is_pawn_promotion:
+            reduction = 2 if i >= 3 * LMR_FULL_DEPTH_MOVES and depth > 3 else 1
+        if i == 0 or not (PRINCIPAL_VARIATION_SEARCH or reduction):
+            score = -findMoveNegaMaxAlphaBeta(gs, nextMoves, depth - 1, -beta, -alpha, -turnMultiplier, ply + 1)
+        else:
+            # after the first move only prove each move is no better than alpha, and search it properly when it is.
+            # Re-searches regenerate the child's moves because the first search left its check and draw flags behind
+            score = -findMoveNegaMaxAlphaBeta(gs, nextMoves, depth - 1 - reduction, -alpha - NULL_WINDOW, -alpha,
+                                              -turnMultiplier, ply + 1)
+            if score > alpha and searchStats is not None:
+                searchStats["reSearches"] += 1
+            if score > alpha and reduction and PRINCIPAL_VARIATION_SEARCH:
+                nextMoves = gs.get_valid_moves()
+                score = -findMoveNegaMaxAlphaBeta(gs, nextMoves, depth - 1, -alpha - NULL_WINDOW, -alpha,
+                                                  -turnMultiplier, ply + 1)
+            if score > alpha and (score < beta or not PRINCIPAL_VARIATION_SEARCH):
+                nextMoves = gs.get_valid_moves()
+                score = -findMoveNegaMaxAlphaBeta(gs, nextMoves, depth - 1, -beta, -alpha, -turnMultiplier, ply + 1)
         if score > maxScore:
             maxScore = score
-            if depth == DEPTH:
+            bestMove = move
+            if ply == 0:
                 nextMove = move
         gs.undo_move()
         if maxScore > alpha:
             alpha = maxScore
         if alpha >= beta:
+            if searchStats is not None:
+                searchStats["betaCutoffs"] += 1
+                searchStats["firstMoveCutoffs"] += i == 0
+            if move.piece_captured == "--" and not move.is_pawn_promotion:
+                storeKiller(move, ply)
+                historyScores[move.move_ID] = historyScores.get(move.move_ID, 0) + depth * depth
             break
+
+    if maxScore <= alphaOrig:
+        bound = UPPERBOUND
+    elif maxScore >= beta:
+        bound = LOWERBOUND
+    else:
+        bound = EXACT
+    transpositionTable.store(gs.zobristKey, depth, maxScore, bound, bestMove)
     return maxScore
 
 
+def loadTablebase(path=TABLEBASE_PATH):
+    # opened on first use; stays None when switched off or when tablebase.py has not generated the file
+    global tablebase, tablebaseLoaded
+    if not tablebaseLoaded:
+        tablebaseLoaded = True
+        if USE_TABLEBASE and os.path.exists(path):
+            tablebase = Tablebase(path)
+    return tablebase if USE_TABLEBASE else None
 
-def scoreMaterial(board, gs, validMoves):
-    score = 0
-    nWPieces = 0
-    nBPieces = 0
 
+def tablebaseScore(entry):
+    result, plies = entry
+    return result * (TABLEBASE_WIN - plies)
+
+
+def tablebaseMove(gs, validMoves):
+    # at a covered root every move is one probe away from its exact result, so no search is needed
+    global searchScore, completedDepth, nodesSearched
+    if not validMoves or tablebase.probe(gs) is None:
+        return None
+    bestMove = None
+    bestScore = -CHECKMATE
+    for move in validMoves:
+        gs.make_move(move)
+        entry = tablebase.probe(gs)
+        gs.undo_move()
+        score = -tablebaseScore(entry) if entry is not None else STALEMATE
+        if score > bestScore:
+            bestScore = score
+            bestMove = move
+    searchScore = bestScore
+    completedDepth = 0
+    nodesSearched = len(validMoves)
+    return bestMove
+
+
+def hasPieces(gs):
+    colour = "w" if gs.whiteToMove else "b"
+    counts = gs.pieceCounts
+    return counts[colour + "N"] + counts[colour + "B"] + counts[colour + "R"] + counts[colour + "Q"] != 0
+
+
+def quiescenceSearch(gs, validMoves, alpha, beta, turnMultiplier, ply):
+    global nodesSearched
+    nodesSearched += 1
+    checkSearchLimits()
+    if searchStats is not None:
+        searchStats["quiescenceNodes"] += 1
+    if searchTablebase is not None and ply != 0:
+        entry = searchTablebase.probe(gs)
+        if entry is not None:
+            if searchStats is not None:
+                searchStats["tablebaseHits"] += 1
+            return tablebaseScore(entry)
+    standPat = turnMultiplier * scoreMaterial(gs.board, gs, validMoves)
+    if gs.checkmate or gs.stalemate or standPat >= beta:
+        return standPat
+    if standPat > alpha:
+        alpha = standPat
+
+    captures = [move for move in validMoves if move.piece_captured != "--" or move.is_pawn_promotion]
+    for move in orderedMoves(captures, -1, ply):
+        gain = pieceScores[move.piece_captured[1]] * 1.5 if move.piece_captured != "--" else 0
+        if move.is_pawn_promotion:
+            gain += (pieceScores["Q"] - pieceScores["p"]) * 1.5
+        # delta pruning: even winning this material cleanly cannot lift the score to alpha
+        if standPat + gain + DELTA_MARGIN <= alpha:
+            continue
+        gs.make_move(move)
+        nextMoves = gs.get_valid_moves()
+        score = -quiescenceSearch(gs, nextMoves, -beta, -alpha, -turnMultiplier, ply + 1)
+        gs.undo_move()
+        if score >= beta:
+            return score
+        if score > alpha:
+            alpha = score
+    return alpha
+
+
+
+def scoreMaterial(board, gs, validMoves):
     if gs.checkmate:
         if gs.whiteToMove:
             return -CHECKMATE
@@ -116,46 +765,14 @@ def scoreMaterial(board, gs, validMoves):
     if gs.stalemate:
         return STALEMATE
 
-    for row in board:
-        for square in row:
-            if square[0] == "w":
-                score += pieceScores[square[1]] * 1.5
-                nWPieces += 1
-            if square[0] == "b":
-                score -= pieceScores[square[1]] * 1.5
-                nBPieces += 1
-
-    if gs.whiteToMove:
-        activityScore = (len(validMoves)/nWPieces) * 0.25
-        for i in range(8):
-            if gs.board[7][i] == ("wN" or "wB"):
-                activityScore -= 0.1
-
-    else:
-        activityScore = len(validMoves)/nBPieces
-        for i in range(8):
-            if gs.board[0][i] == ("bN" or "bB"):
-                activityScore -= 0.1
-
-
-    for i in range(4):
-        for j in range(4):
-            square = board[2 + i][2 + j]
-            if (1 <= i <= 2) and (1 <= j <= 2):
-                scoreIncrease = 0.1
-            else:
-                scoreIncrease = 0.05
-
-            if square != "--":
-                if square[0] == "w":
-                    if square[1] == ("N" or "B"):
-                        scoreIncrease += 0.1
-
-
-                if square[0] == "b":
-                    if square[1] == ("N" or "B"):
-                        scoreIncrease += 0.1
+    # material and piece-square terms are kept up to date by make_move/undo_move
+    score = gs.materialScore + gs.positionScore
 
+    colour = "w" if gs.whiteToMove else "b"
+    nPieces = 0
+    for kind in pieceScores:
+        nPieces += gs.pieceCounts[colour + kind]
+    activityScore = (len(validMoves) / nPieces) * 0.25
 
     if not (gs.currentCastlingRight.wks and gs.currentCastlingRight.wqs):
         score -= 0.3
@@ -169,64 +786,125 @@ def scoreMaterial(board, gs, validMoves):
             score -= 0.5
 
     if gs.whiteToMove:
-        score += (scoreIncrease + activityScore)
+        score += activityScore
     else:
-        score -= (scoreIncrease + activityScore)
+        score -= activityScore
 
     return score
 
-def checkOpeningBook(gs, moveList, validMoves):
-    global inBook
-    openingBook = open("Opening_book.txt", "r")
-    moveString = ""
-    if len(moveList) != 0:
-
-        if len(moveList) % 2 != 0:
-            moveList = moveList + [""]
-
-        moveSubList = [moveList[n:n+2] for n in range(0, len(moveList), 2)]
-        for i in range(len(moveSubList)):
-            moveString += str(i+1) + "." + moveSubList[i][0] + " " + moveSubList[i][1]
-            if moveSubList[i][1] != "":
-                moveString += " "
-    openingBookLines = openingBook.readlines()
-
-
-    move_lines = [line for line in openingBookLines if moveString in line]
-    if len(move_lines) == 0:
-        inBook = False
-        return None
-    for move in move_lines:
-        move_lines[move_lines.index(move)] = move.removesuffix("\n")
-    picked_line = move_lines[random.randint(0, len(move_lines)) - 1]
-    if moveString == "":
-        movesLeftInLine = picked_line
+class BinaryOpeningBook:
+    # sorted (zobrist key, move_ID, weight) records, searched in place through a memory map
+    RECORD = struct.Struct("<QHH")
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.count = len(self.data) // self.RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return self.RECORD.unpack_from(self.data, i * self.RECORD.size)[0]
+
+    def get(self, key, default=None):
+        i = bisect_left(self, key)
+        entries = []
+        while i < self.count:
+            recordKey, moveID, weight = self.RECORD.unpack_from(self.data, i * self.RECORD.size)
+            if recordKey != key:
+                break
+            entries.append((moveID, weight))
+            i += 1
+        return entries if entries else default
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+def parseOpeningBook(gameStateClass, path=OPENING_BOOK_PATH):
+    # replays every line once so lookups are keyed by position and transpositions share entries
+    book = {}
+    with open(path, "r") as bookFile:
+        for line in bookFile:
+            gs = gameStateClass()
+            for token in line.split():
+                san = token.split(".")[-1]
+                if san == "":
+                    continue
+                move = gs.move_from_san(san)
+                if move is None:
+                    break
+                weights = book.setdefault(gs.zobristKey, {})
+                weights[move.move_ID] = weights.get(move.move_ID, 0) + 1
+                gs.make_move(move)
+    return {key: list(weights.items()) for key, weights in book.items()}
+
+
+def compileOpeningBook(gameStateClass, path, textPath=OPENING_BOOK_PATH):
+    book = parseOpeningBook(gameStateClass, textPath)
+    with open(path, "wb") as bookFile:
+        for key in sorted(book):
+            for moveID, weight in sorted(book[key]):
+                bookFile.write(BinaryOpeningBook.RECORD.pack(key, moveID, min(weight, 0xFFFF)))
+
+
+def loadOpeningBook(gameStateClass, path=OPENING_BOOK_PATH):
+    global openingBook
+    if path.endswith(".bin"):
+        openingBook = BinaryOpeningBook(path)
     else:
-        movesLeftInLine = picked_line.split(moveString)[1]
-    moves = movesLeftInLine.split(" ")
-    for move in moves:
-        moves[moves.index(move)] = move.replace(".", "")
-    for move in moves:
-        if move[0] in ("1", "2", "3", "4", "5", "6", "7", "8"):
-            moves[moves.index(move)] = move[:0] + move[1:]
-    newMove = moves[0]
+        openingBook = parseOpeningBook(gameStateClass, path)
+    return openingBook
 
-    for move in validMoves:
-        gs.make_move(move)
-        x = move.get_chess_notation(gs)
-        gs.undo_move()
-        if x == newMove:
-            return move
 
+def checkOpeningBook(gs, validMoves):
+    global inBook
+    if openingBook is None:
+        loadOpeningBook(type(gs))
 
-    openingBook.close()
+    entries = openingBook.get(gs.zobristKey)
+    if entries:
+        movesByID = {move.move_ID: move for move in validMoves}
+        candidates = [(movesByID[moveID], weight) for moveID, weight in entries if moveID in movesByID]
+        if candidates:
+            return random.choices([move for move, weight in candidates],
+                                  weights=[weight for move, weight in candidates])[0]
 
     inBook = False
     return None
 
-def orderedMoves(gs, board, validMoves):
-    def orderer(move):
-        return scoreMaterial(board, gs, validMoves)
+def orderedMoves(validMoves, ttMoveID=-1, ply=0):
+    killers = killerMoves[ply] if ply < len(killerMoves) else (-1, -1)
 
-    in_order = sorted(validMoves, key=orderer, reverse=gs.whiteToMove)
-    return list(in_order)
+    def orderer(move):
+        if move.move_ID == ttMoveID:
+            return 5, 0
+        if move.piece_captured != "--":
+            # MVV-LVA: most valuable victim first, then least valuable attacker
+            return 4, orderValues[move.piece_captured[1]] * 16 - orderValues[move.piece_move[1]]
+        if move.is_pawn_promotion:
+            return 3, 0
+        if move.move_ID == killers[0]:
+            return 2, 1
+        if move.move_ID == killers[1]:
+            return 2, 0
+        return 1, historyScores.get(move.move_ID, 0)
+
+    return sorted(validMoves, key=orderer, reverse=True)
+
+
+def storeKiller(move, ply):
+    if ply < len(killerMoves) and killerMoves[ply][0] != move.move_ID:
+        killerMoves[ply][1] = killerMoves[ply][0]
+        killerMoves[ply][0] = move.move_ID
+
+
+def clearMoveOrdering():
+    for killers in killerMoves:
+        killers[0] = -1
+        killers[1] = -1
+    # keep some history between moves, but let the previous search's scores fade
+    for moveID in list(historyScores):
+        historyScores[moveID] //= 2
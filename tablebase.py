@@ -0,0 +1,204 @@
+import argparse
+import mmap
+import os
+import sys
+import time
+
+from chessEngine import KING_ATTACKS, PAWN_ATTACKS, ROOK_DIRECTIONS, BISHOP_DIRECTIONS, sliding_attacks
+
+TABLEBASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebase.bin")
+
+# Every table holds one byte per (side to move, white king, white piece, black king), with the extra piece always
+# white; positions where it is black are probed colour-flipped. 0 is a draw, ILLEGAL marks impossible placements
+# and anything else is the distance to mate in plies plus one, so odd entries mean the side to move is mated.
+TABLES = ("KQK", "KRK", "KPK")
+TABLE_SIZE = 2 * 64 * 64 * 64
+DRAW = 0
+ILLEGAL = 255
+WHITE = 0
+BLACK = 1
+
+
+def index(toMove, whiteKing, piece, blackKing):
+    return ((toMove * 64 + whiteKing) * 64 + piece) * 64 + blackKing
+
+
+def bits(bb):
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+
+def piece_attacks(kind, sq, occupied):
+    if kind == "Q":
+        return sliding_attacks(sq, occupied, ROOK_DIRECTIONS + BISHOP_DIRECTIONS)
+    if kind == "R":
+        return sliding_attacks(sq, occupied, ROOK_DIRECTIONS)
+    return PAWN_ATTACKS["w"][sq]
+
+
+def generate_table(kind, queenTable=None, out=sys.stdout):
+    # retrograde analysis: start from the mates and walk backwards one ply at a time. Only white can win, so a white
+    # position is won as soon as one move reaches a lost black position, and a black position is lost once every
+    # king move has been found to reach a won white position
+    values = bytearray(TABLE_SIZE)
+    replies = bytearray(TABLE_SIZE)
+    frontier = [[]]
+    start = time.perf_counter()
+
+    for whiteKing in range(64):
+        for piece in range(64):
+            for blackKing in range(64):
+                whiteIndex = index(WHITE, whiteKing, piece, blackKing)
+                blackIndex = index(BLACK, whiteKing, piece, blackKing)
+                if piece == whiteKing or piece == blackKing or whiteKing == blackKing \
+                        or KING_ATTACKS[whiteKing] >> blackKing & 1 or (kind == "P" and piece // 8 in (0, 7)):
+                    values[whiteIndex] = ILLEGAL
+                    values[blackIndex] = ILLEGAL
+                    continue
+                kings = 1 << whiteKing | 1 << blackKing
+                if piece_attacks(kind, piece, kings) >> blackKing & 1:
+                    # black is in check, so it cannot be white's move
+                    values[whiteIndex] = ILLEGAL
+                    inCheck = True
+                else:
+                    inCheck = False
+                    if kind == "P" and piece // 8 == 1 and not kings >> (piece - 8) & 1:
+                        # promoting leaves this table; the resulting KQK position is already solved
+                        queenValue = queenTable[index(BLACK, whiteKing, piece - 8, blackKing)]
+                        if queenValue != DRAW and queenValue != ILLEGAL and queenValue & 1:
+                            values[whiteIndex] = queenValue + 1
+                            while len(frontier) <= queenValue:
+                                frontier.append([])
+                            frontier[queenValue].append(whiteIndex)
+
+                # the black king's own square stays empty so sliding pieces attack straight through it
+                guarded = KING_ATTACKS[whiteKing] | piece_attacks(kind, piece, 1 << whiteKing | 1 << piece)
+                moves = 0
+                for sq in bits(KING_ATTACKS[blackKing]):
+                    if sq == piece:
+                        moves += not KING_ATTACKS[whiteKing] >> sq & 1
+                    elif not guarded >> sq & 1:
+                        moves += 1
+                replies[blackIndex] = moves
+                if moves == 0 and inCheck:
+                    values[blackIndex] = 1
+                    frontier[0].append(blackIndex)
+
+    plies = 0
+    while plies < len(frontier):
+        for i in frontier[plies]:
+            if values[i] != plies + 1:
+                continue
+            toMove, rest = divmod(i, 64 * 64 * 64)
+            whiteKing, rest = divmod(rest, 64 * 64)
+            piece, blackKing = divmod(rest, 64)
+            if len(frontier) == plies + 1:
+                frontier.append([])
+            if toMove == BLACK:
+                for previous in white_unmoves(kind, whiteKing, piece, blackKing):
+                    if values[previous] != ILLEGAL and (values[previous] == DRAW or values[previous] > plies + 2):
+                        values[previous] = plies + 2
+                        frontier[plies + 1].append(previous)
+            else:
+                for sq in bits(KING_ATTACKS[blackKing] & ~KING_ATTACKS[whiteKing]):
+                    if sq == piece:
+                        continue
+                    previous = index(BLACK, whiteKing, piece, sq)
+                    if values[previous] == DRAW and replies[previous] != 0:
+                        replies[previous] -= 1
+                        if replies[previous] == 0:
+                            values[previous] = plies + 2
+                            frontier[plies + 1].append(previous)
+        plies += 1
+
+    won = sum(1 for value in values if value != DRAW and value != ILLEGAL and not value & 1)
+    out.write("%s: %d won positions, longest mate %d plies, %.1fs\n" % (
+        "K%sK" % kind, won, len(frontier) - 2, time.perf_counter() - start))
+    return values
+
+
+def white_unmoves(kind, whiteKing, piece, blackKing):
+    # white-to-move positions that reach this black-to-move position with one quiet white move
+    occupied = 1 << whiteKing | 1 << piece | 1 << blackKing
+    for sq in bits(KING_ATTACKS[whiteKing] & ~occupied & ~KING_ATTACKS[blackKing]):
+        yield index(WHITE, sq, piece, blackKing)
+    if kind == "P":
+        if piece // 8 < 6 and not occupied >> (piece + 8) & 1:
+            yield index(WHITE, whiteKing, piece + 8, blackKing)
+            if piece // 8 == 4 and not occupied >> (piece + 16) & 1:
+                yield index(WHITE, whiteKing, piece + 16, blackKing)
+    else:
+        for sq in bits(piece_attacks(kind, piece, occupied) & ~occupied):
+            yield index(WHITE, whiteKing, sq, blackKing)
+
+
+def generate_tablebase(path=TABLEBASE_PATH, out=sys.stdout):
+    tables = {}
+    for name in TABLES:
+        tables[name] = generate_table(name[1], tables.get("KQK"), out)
+    with open(path, "wb") as tablebaseFile:
+        for name in TABLES:
+            tablebaseFile.write(tables[name])
+
+
+class Tablebase:
+    # the generated tables, read in place through a memory map
+    def __init__(self, path=TABLEBASE_PATH):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.offsets = {name[1]: i * TABLE_SIZE for i, name in enumerate(TABLES)}
+
+    def probe(self, gs):
+        # (result, plies to mate) for the side to move, with result 1 for a win, -1 for a loss and 0 for a draw.
+        # None when the position is not covered by a table
+        counts = gs.pieceCounts
+        total = 0
+        for piece in counts:
+            total += counts[piece]
+        if total == 2:
+            return 0, 0
+        if total != 3:
+            return None
+
+        extra = None
+        for r in range(8):
+            for c in range(8):
+                piece = gs.board[r][c]
+                if piece == "wK":
+                    whiteKing = r * 8 + c
+                elif piece == "bK":
+                    blackKing = r * 8 + c
+                elif piece != "--":
+                    extra = piece
+                    pieceSquare = r * 8 + c
+        kind = extra[1].upper()
+        if kind not in self.offsets:
+            return None
+        toMove = WHITE if gs.whiteToMove else BLACK
+        if extra[0] == "b":
+            # flip the board so the extra piece is white
+            whiteKing, blackKing = blackKing ^ 56, whiteKing ^ 56
+            pieceSquare ^= 56
+            toMove ^= 1
+
+        value = self.data[self.offsets[kind] + index(toMove, whiteKing, pieceSquare, blackKing)]
+        if value == DRAW or value == ILLEGAL:
+            return 0, 0
+        return -1 if value & 1 else 1, value - 1
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the " + ", ".join(TABLES) + " endgame tables.")
+    parser.add_argument("--output", default=TABLEBASE_PATH)
+    args = parser.parse_args()
+    generate_tablebase(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+from chessEngine import GameState, BitboardGameState
+
+
+def play(gameStateClass, sans, fen=None):
+    gs = gameStateClass()
+    if fen is not None:
+        gs.set_fen(fen)
+    for san in sans:
+        gs.make_move(gs.move_from_san(san))
+    return gs
+
+
+def test_double_push_transposes_when_en_passant_is_impossible():
+    for gameStateClass in (GameState, BitboardGameState):
+        first = play(gameStateClass, ["Nf3", "Nf6", "d4"])
+        second = play(gameStateClass, ["d4", "Nf6", "Nf3"])
+        assert first.zobristKey == second.zobristKey
+        assert first.zobristKey == first.compute_zobrist_key()
+
+
+def test_en_passant_file_is_hashed_when_a_capture_is_possible():
+    pushed = play(GameState, ["e4"], "4k3/8/8/8/3p4/8/4P3/4K3 w - - 0 1")
+    stepped = GameState()
+    stepped.set_fen("4k3/8/8/8/3pP3/8/8/4K3 b - - 0 1")
+    assert pushed.zobristKey != stepped.zobristKey
+    assert pushed.zobristKey == pushed.compute_zobrist_key()
+
+
+def test_null_move_and_undo_restore_the_key():
+    gs = play(BitboardGameState, ["e4", "d5", "e5", "f5"])
+    key = gs.zobristKey
+    gs.make_null_move()
+    assert gs.zobristKey == gs.compute_zobrist_key()
+    gs.undo_move()
+    assert gs.zobristKey == key
+    while gs.moveLog:
+        gs.undo_move()
+        assert gs.zobristKey == gs.compute_zobrist_key()
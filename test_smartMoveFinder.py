@@ -0,0 +1,30 @@
+import smartMoveFinder
+from chessEngine import GameState, BitboardGameState
+
+
+def bookSans(book, gs):
+    validMoves = gs.get_valid_moves()
+    movesByID = {move.move_ID: move for move in validMoves}
+    return sorted(gs.get_san(movesByID[moveID], validMoves) for moveID, weight in book.get(gs.zobristKey, []))
+
+
+def playSans(sans):
+    gs = BitboardGameState()
+    for san in sans:
+        gs.make_move(gs.move_from_san(san))
+    return gs
+
+
+def test_transposed_book_position_merges_its_moves(tmp_path):
+    # the book reaches this position as 1.d4 Nf6 2.c4 (c5, e6) and as 1.c4 Nf6 2.d4 (g6)
+    book = smartMoveFinder.parseOpeningBook(GameState)
+    binaryPath = str(tmp_path / "book.bin")
+    smartMoveFinder.compileOpeningBook(GameState, binaryPath)
+    binaryBook = smartMoveFinder.BinaryOpeningBook(binaryPath)
+    try:
+        for sans in (["d4", "Nf6", "c4"], ["c4", "Nf6", "d4"]):
+            gs = playSans(sans)
+            assert bookSans(book, gs) == ["c5", "e6", "g6"]
+            assert bookSans(binaryBook, gs) == ["c5", "e6", "g6"]
+    finally:
+        binaryBook.close()
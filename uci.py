@@ -0,0 +1,207 @@
+import sys
+import threading
+
+import smartMoveFinder
+from chessEngine import BitboardGameState, MATERIAL_WEIGHT
+
+def uciMove(move):
+    text = move.get_rank_file(move.start_row, move.start_col) + move.get_rank_file(move.end_row, move.end_col)
+    return text + "q" if move.is_pawn_promotion else text
+
+
+def findUciMove(gs, text, validMoves=None):
+    if validMoves is None:
+        validMoves = gs.get_valid_moves()
+    for move in validMoves:
+        # the engine only promotes to a queen, so any promotion suffix matches its promotion move
+        if uciMove(move)[:4] == text[:4]:
+            return move
+    return None
+
+
+def principalVariation(gs, move, maxLength):
+    # always starts with the move being reported; the transposition table only extends it when its own best move
+    # here is the same one, which it is not after a parallel search whose workers kept their tables to themselves
+    ttEntry = smartMoveFinder.transpositionTable.probe(gs.zobristKey)
+    if ttEntry is None or ttEntry[3] != move.move_ID:
+        return [move]
+    return smartMoveFinder.principalVariation(gs, maxLength) or [move]
+
+
+def allocateTime(gs, options):
+    # seconds to spend on this move from the go command's clock fields, or None to search without a clock
+    if "movetime" in options:
+        return options["movetime"] / 1000
+    clock = options.get("wtime" if gs.whiteToMove else "btime")
+    if clock is None:
+        return None
+    increment = options.get("winc" if gs.whiteToMove else "binc", 0)
+    movesToGo = options.get("movestogo", 30)
+    budget = clock / max(movesToGo, 1) + increment * 0.8
+    return max(min(budget, clock / 2 - 50), 10) / 1000
+
+
+class UciEngine:
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.outputLock = threading.Lock()
+        self.gs = BitboardGameState()
+        self.ownBook = True
+        self.search = None
+        self.pondering = False
+        self.ponderTime = None
+        self.waitForStop = False
+        self.stopped = threading.Event()
+
+    def send(self, line):
+        with self.outputLock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    def handle(self, line):
+        # returns False once the engine should exit
+        tokens = line.split()
+        if not tokens:
+            return True
+        command = tokens[0]
+        if command == "uci":
+            self.send("id name smartMoveFinder")
+            self.send("id author JoeldotSmith")
+            self.send("option name Hash type spin default %d min 1 max 4096" % smartMoveFinder.TT_SIZE_MB)
+            self.send("option name Threads type spin default 1 min 1 max 64")
+            self.send("option name OwnBook type check default true")
+            self.send("option name Ponder type check default false")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.setOption(tokens)
+        elif command == "ucinewgame":
+            self.stopSearch()
+            smartMoveFinder.transpositionTable.clear()
+            smartMoveFinder.historyScores.clear()
+            self.gs = BitboardGameState()
+        elif command == "position":
+            self.stopSearch()
+            self.setPosition(tokens)
+        elif command == "go":
+            self.stopSearch()
+            self.go(tokens)
+        elif command == "stop":
+            self.stopSearch()
+        elif command == "ponderhit":
+            self.ponderHit()
+        elif command == "quit":
+            self.stopSearch()
+            return False
+        return True
+
+    def setOption(self, tokens):
+        if "name" not in tokens:
+            return
+        valueAt = tokens.index("value") if "value" in tokens else len(tokens)
+        name = " ".join(tokens[tokens.index("name") + 1:valueAt]).lower()
+        value = " ".join(tokens[valueAt + 1:])
+        if name == "hash":
+            smartMoveFinder.TT_SIZE_MB = int(value)
+            smartMoveFinder.transpositionTable = smartMoveFinder.TranspositionTable(int(value))
+        elif name == "threads":
+            smartMoveFinder.SEARCH_WORKERS = int(value)
+        elif name == "ownbook":
+            self.ownBook = value.lower() == "true"
+
+    def setPosition(self, tokens):
+        self.gs = BitboardGameState()
+        movesAt = tokens.index("moves") if "moves" in tokens else len(tokens)
+        if len(tokens) > 1 and tokens[1] == "fen":
+            self.gs.set_fen(" ".join(tokens[2:movesAt]))
+        for text in tokens[movesAt + 1:]:
+            move = findUciMove(self.gs, text)
+            if move is None:
+                self.send("info string illegal move %s" % text)
+                break
+            self.gs.make_move(move)
+
+    def go(self, tokens):
+        options = {}
+        flags = set()
+        i = 1
+        while i < len(tokens):
+            if tokens[i] in ("infinite", "ponder"):
+                flags.add(tokens[i])
+                i += 1
+            elif i + 1 < len(tokens):
+                try:
+                    options[tokens[i]] = int(tokens[i + 1])
+                except ValueError:
+                    pass
+                i += 2
+            else:
+                i += 1
+
+        timeLimit = allocateTime(self.gs, options)
+        maxDepth = options.get("depth")
+        if maxDepth is None:
+            maxDepth = smartMoveFinder.MAX_DEPTH if timeLimit is not None or "nodes" in options or flags \
+                else smartMoveFinder.DEPTH
+        self.pondering = "ponder" in flags
+        self.ponderTime = timeLimit
+        self.waitForStop = bool(flags)
+        self.stopped.clear()
+        smartMoveFinder.inBook = self.ownBook and not flags
+
+        self.search = smartMoveFinder.BackgroundSearch(self.gs, onIteration=self.sendInfo,
+                                                       onFinished=self.sendBestMove, maxDepth=maxDepth,
+                                                       timeLimit=None if flags else timeLimit,
+                                                       nodeLimit=options.get("nodes"))
+        self.search.start()
+
+    def sendBestMove(self, search):
+        # infinite and ponder searches must not answer before stop or ponderhit
+        if self.waitForStop:
+            self.stopped.wait()
+        move = search.result if search.result is not None else search.bestMove
+        if move is None:
+            validMoves = search.gs.get_valid_moves()
+            move = validMoves[0] if validMoves else None
+        if move is None:
+            self.send("bestmove 0000")
+            return
+        pv = principalVariation(search.gs, move, 2)
+        self.send("bestmove %s%s" % (uciMove(move), " ponder " + uciMove(pv[1]) if len(pv) > 1 else ""))
+
+    def sendInfo(self, depth, score, move, nodes, seconds):
+        # called on the search thread between iterations, while its copy of the position is at the root
+        pv = principalVariation(self.search.gs, move, depth)
+        if abs(score) >= smartMoveFinder.CHECKMATE:
+            scoreText = "mate %d" % ((len(pv) + 1) // 2 if score > 0 else -(len(pv) // 2))
+        else:
+            scoreText = "cp %d" % round(score * 100 / MATERIAL_WEIGHT)
+        self.send("info depth %d score %s nodes %d nps %d time %d pv %s" % (
+            depth, scoreText, nodes, nodes / seconds if seconds else 0, seconds * 1000,
+            " ".join(uciMove(pvMove) for pvMove in pv)))
+
+    def ponderHit(self):
+        if self.search is None or not self.pondering:
+            return
+        self.pondering = False
+        self.waitForStop = False
+        self.search.setTimeLimit(self.ponderTime)
+        self.stopped.set()
+
+    def stopSearch(self):
+        if self.search is not None:
+            self.stopped.set()
+            self.search.cancel()
+            self.search = None
+
+
+def main():
+    engine = UciEngine()
+    for line in sys.stdin:
+        if not engine.handle(line.strip()):
+            break
+
+
+if __name__ == "__main__":
+    main()